@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Offline benchmark and load-test suite; see benchmarks/run.py."""
@@ -0,0 +1,106 @@
+# benchmarks/corpus.py
+
+import io
+import json
+import random
+import logging
+from typing import Dict, List
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Words of the synthetic documents; a fixed list so a seed always gives the same corpus
+VOCABULARY = (
+    "test automation pipeline regression coverage flaky suite release deploy staging database "
+    "api endpoint request response latency throughput cache index query document search model "
+    "token prompt answer quality metric dashboard alert incident review commit branch merge build "
+    "artifact container cluster worker queue retry timeout fixture mock contract integration unit "
+    "performance benchmark baseline profile sample percentile error failure success report"
+).split()
+
+TOPICS = [
+    "flaky tests", "release pipeline", "api latency", "cache hit ratio", "database migration",
+    "contract testing", "load testing", "incident review", "code coverage", "staging environment"
+]
+
+
+def _sentence(rng: random.Random, topic: str) -> str:
+    words = rng.choices(VOCABULARY, k=rng.randint(8, 20))
+    words.insert(rng.randrange(len(words)), topic)
+    return " ".join(words).capitalize() + "."
+
+
+def make_document(rng: random.Random, index: int, words: int) -> Dict:
+    """
+    Build one synthetic document of roughly ``words`` words.
+
+    Every fifth document is JSON and every third Markdown, so the
+    extractors of each format are exercised; the rest are plain text.
+    Each document mentions one of TOPICS throughout, so searches for a
+    topic have a known set of relevant documents.
+    """
+    topic = TOPICS[index % len(TOPICS)]
+    paragraphs, count = [], 0
+    while count < words:
+        paragraph = " ".join(_sentence(rng, topic) for _ in range(rng.randint(3, 6)))
+        paragraphs.append(paragraph)
+        count += len(paragraph.split())
+
+    if index % 5 == 0:
+        content = json.dumps({"title": topic, "sections": [{"text": p} for p in paragraphs]}, indent=2)
+        filename = f"doc_{index:05d}.json"
+    elif index % 3 == 0:
+        content = f"# {topic.title()}\n\n" + "\n\n".join(paragraphs)
+        filename = f"doc_{index:05d}.md"
+    else:
+        content = "\n\n".join(paragraphs)
+        filename = f"doc_{index:05d}.txt"
+    return {"filename": filename, "topic": topic, "content": content}
+
+
+def make_corpus(documents: int = 50, words: int = 400, seed: int = 0) -> List[Dict]:
+    """Build a reproducible synthetic corpus."""
+    rng = random.Random(seed)
+    return [make_document(rng, index, words) for index in range(documents)]
+
+
+def seed_gridfs(corpus: List[Dict]) -> List:
+    """
+    Store a corpus in GridFS and index it, as an upload's ingestion job would.
+
+    Runs synchronously, so every document is searchable on return.
+
+    Returns:
+        GridFS ids of the stored documents
+    """
+    from rag.com.ingest import store_upload
+    from rag.com.utils_ref import document_searcher
+
+    file_ids = []
+    for document in corpus:
+        file_id, _ = store_upload(
+            document_searcher.fs, io.BytesIO(document["content"].encode('utf-8')), document["filename"]
+        )
+        document_searcher.ingest_document(file_id, document["filename"], progress=lambda stage, fraction: None)
+        file_ids.append(file_id)
+    logger.info(f"Seeded {len(file_ids)} documents into GridFS")
+    return file_ids
+
+
+def seed_queries(count: int = 200, seed: int = 0) -> int:
+    """Store answered queries so query-history search has something to match."""
+    from rag.com.db import collection
+
+    rng = random.Random(seed)
+    if not count:
+        return 0
+    collection.insert_many([
+        {
+            "query": f"How do I handle {rng.choice(TOPICS)} in {rng.choice(VOCABULARY)}?",
+            "response": " ".join(rng.choices(VOCABULARY, k=40))
+        }
+        for _ in range(count)
+    ])
+    logger.info(f"Seeded {count} stored queries")
+    return count
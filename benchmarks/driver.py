@@ -0,0 +1,199 @@
+# benchmarks/driver.py
+
+import math
+import time
+import itertools
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def send(base_url: str, entry: Dict, timeout: float = 60.0) -> Dict:
+    """
+    Send one workload request and read the whole response.
+
+    Streamed responses are read to the end, so their latency covers the
+    full stream. Connection errors and timeouts are recorded with status 0.
+    """
+    start = time.perf_counter()
+    try:
+        with _session().request(
+            entry["method"], base_url + entry["path"], json=entry.get("body"), stream=True, timeout=timeout
+        ) as response:
+            size = sum(len(chunk) for chunk in response.iter_content(chunk_size=65536))
+            status = response.status_code
+    except requests.RequestException as e:
+        logger.debug(f"{entry['kind']} failed: {e}")
+        status, size = 0, 0
+    return {"kind": entry["kind"], "status": status, "seconds": time.perf_counter() - start, "bytes": size}
+
+
+def closed_loop(
+    base_url: str,
+    workload: List[Dict],
+    concurrency: int = 8,
+    requests_total: Optional[int] = None,
+    duration: Optional[float] = None
+) -> List[Dict]:
+    """
+    Replay a workload with a fixed number of clients, each sending its next
+    request as soon as the previous one completes.
+
+    Stops after ``requests_total`` requests (default: one pass over the
+    workload, cycling if more are asked for) or ``duration`` seconds.
+    """
+    requests_total = requests_total or (None if duration else len(workload))
+    results, lock = [], threading.Lock()
+    position = iter(range(requests_total)) if requests_total else itertools.count()
+    deadline = time.monotonic() + duration if duration else math.inf
+
+    def client():
+        while time.monotonic() < deadline:
+            with lock:
+                index = next(position, None)
+            if index is None:
+                return
+            result = send(base_url, workload[index % len(workload)])
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=client, name=f"bench-client-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def open_loop(
+    base_url: str,
+    workload: List[Dict],
+    rate: Optional[float] = None,
+    max_in_flight: int = 256,
+    duration: Optional[float] = None
+) -> List[Dict]:
+    """
+    Replay a workload at its recorded arrival times, whether or not earlier
+    requests have completed.
+
+    With ``rate`` the requests are instead sent evenly at that many per
+    second. Latency is measured from each request's scheduled send time, so
+    time spent waiting for a free client thread counts against the server
+    (no coordinated omission).
+    """
+    if rate:
+        schedule = [index / rate for index in range(len(workload))]
+    else:
+        schedule = [entry.get("at", 0.0) for entry in workload]
+    results, lock = [], threading.Lock()
+
+    def timed(entry, scheduled):
+        result = send(base_url, entry)
+        result["seconds"] = time.perf_counter() - scheduled
+        with lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_in_flight, thread_name_prefix="bench-open") as pool:
+        for entry, offset in zip(workload, schedule):
+            if duration and offset > duration:
+                break
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(timed, entry, start + offset)
+    return results
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def _summary(results: List[Dict], seconds: float) -> Dict:
+    latencies = sorted(result["seconds"] * 1000 for result in results)
+    statuses = defaultdict(int)
+    for result in results:
+        statuses[str(result["status"])] += 1
+    errors = sum(count for status, count in statuses.items() if status == '0' or int(status) >= 400)
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "status_codes": dict(sorted(statuses.items())),
+        "throughput_rps": round(len(results) / seconds, 3) if seconds else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "max_ms": round(latencies[-1], 3) if latencies else None
+    }
+
+
+def summarize(results: List[Dict], seconds: float) -> Dict:
+    """Throughput, error rate and latency percentiles overall and per request kind."""
+    by_kind = defaultdict(list)
+    for result in results:
+        by_kind[result["kind"]].append(result)
+    return {
+        "duration_seconds": round(seconds, 3),
+        "overall": _summary(results, seconds),
+        "endpoints": {kind: _summary(by_kind[kind], seconds) for kind in sorted(by_kind)}
+    }
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float = 0.1) -> List[Dict]:
+    """
+    Flag regressions of a report against a baseline report.
+
+    An endpoint regresses when its p50, p95 or p99 latency grows, or its
+    throughput drops, by more than ``tolerance`` (a fraction), or its error
+    rate rises by more than one percentage point. Endpoints missing from
+    either report are not compared.
+    """
+    regressions = []
+    for kind, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(kind)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if previous.get(metric) and current.get(metric) and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(_regression(kind, metric, previous[metric], current[metric]))
+        if (
+            previous.get("throughput_rps") and current.get("throughput_rps") is not None
+            and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance)
+        ):
+            regressions.append(_regression(kind, "throughput_rps", previous["throughput_rps"], current["throughput_rps"]))
+        if current["error_rate"] > previous.get("error_rate", 0.0) + 0.01:
+            regressions.append(_regression(kind, "error_rate", previous.get("error_rate", 0.0), current["error_rate"]))
+    return regressions
+
+
+def _regression(kind: str, metric: str, baseline: float, current: float) -> Dict:
+    change = (current - baseline) / baseline if baseline else None
+    return {
+        "endpoint": kind,
+        "metric": metric,
+        "baseline": baseline,
+        "current": current,
+        "change": round(change, 4) if change is not None else None
+    }
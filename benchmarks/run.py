@@ -0,0 +1,226 @@
+# benchmarks/run.py
+"""
+Run a benchmark and compare it with a baseline.
+
+By default the app runs in this process on a local port, against
+mongomock with the stub model, seeded with a synthetic corpus:
+
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+
+``--mongo mongodb://localhost:27017/`` uses a local mongod instead (the
+``--db`` database is dropped and reseeded), ``--model real`` loads the
+configured models (point MODEL_NAME_REMOTE and EMBEDDING_MODEL_NAME at tiny
+ones for quick runs), and ``--url`` drives an already running server,
+seeded separately, without starting one. The exit status is 1 when a
+regression against the baseline is found.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import List
+
+from benchmarks import corpus, driver, workload as workloads
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+DEFAULT_WORKLOAD = BENCHMARKS_DIR / 'workload.jsonl'
+# Settings that must match for a baseline comparison to mean anything
+COMPARABLE_SETTINGS = (
+    'url', 'mongo', 'model', 'token_ms', 'sentiment_ms', 'embed_ms', 'documents', 'words', 'queries',
+    'workload', 'loop', 'concurrency', 'rate', 'requests', 'duration'
+)
+
+
+def _text_filter(document, search, apply) -> bool:
+    """$text stand-in for mongomock: any query word in any string field."""
+    words = set(search['$search'].lower().split())
+    text = " ".join(value for value in document.values() if isinstance(value, str)).lower()
+    return bool(words & set(text.split()))
+
+
+def _text_score(document, search) -> float:
+    """textScore stand-in for mongomock: occurrences of the query words in the string fields."""
+    words = search['$search'].lower().split()
+    text = " ".join(value for value in document.values() if isinstance(value, str)).lower().split()
+    return float(sum(text.count(word) for word in words))
+
+
+def use_mongomock():
+    """Route every MongoClient created from now on to an in-memory mongomock server."""
+    import mongomock
+    import mongomock.aggregate
+    import mongomock.filtering
+    import mongomock.gridfs
+    import pymongo
+
+    pymongo.MongoClient = mongomock.MongoClient
+    mongomock.gridfs.enable_gridfs_integration()
+    # mongomock has no text indexes; approximate $text matching so query history is searched
+    mongomock.filtering.LOGICAL_OPERATOR_MAP.setdefault('$text', _text_filter)
+
+    # ...and score $text matches of aggregations for {"$meta": "textScore"}
+    match_stage = mongomock.aggregate._PIPELINE_HANDLERS['$match']
+    parse = mongomock.aggregate._Parser.parse
+
+    def match_with_score(in_collection, database, options):
+        matched = match_stage(in_collection, database, options)
+        if '$text' not in options:
+            return matched
+        return [{**doc, '_text_score': _text_score(doc, options['$text'])} for doc in matched]
+
+    def parse_text_score(self, expression):
+        if expression == {'$meta': 'textScore'}:
+            return self._doc_dict.get('_text_score', 0.0)
+        return parse(self, expression)
+
+    mongomock.aggregate._PIPELINE_HANDLERS['$match'] = match_with_score
+    mongomock.aggregate._Parser.parse = parse_text_score
+
+
+def start_app(args) -> str:
+    """Configure, seed and serve the app in this process; return its base URL."""
+    os.environ['DB_NAME'] = args.db
+    os.environ.setdefault('INDEX_DIR', tempfile.mkdtemp(prefix='rag-bench-index-'))
+    if args.mongo == 'mongomock':
+        use_mongomock()
+    else:
+        os.environ['MONGO_URI'] = args.mongo
+
+    from rag.com.db import get_client
+    get_client().drop_database(args.db)
+
+    from rag.com.app import app
+    from rag.com.utils_ref import document_searcher
+    if args.mongo == 'mongomock':
+        # mongomock enforces unique indexes by scanning the collection on every insert,
+        # which makes seeding postings quadratic; its queries never use indexes anyway
+        document_searcher.keyword_index._indexes_ready = True
+    if args.model == 'stub':
+        from benchmarks.stub_model import StubModelManager, install
+        install(document_searcher, StubModelManager(args.token_ms, args.sentiment_ms, args.embed_ms))
+
+    start = time.perf_counter()
+    corpus.seed_gridfs(corpus.make_corpus(args.documents, args.words, args.seed))
+    corpus.seed_queries(args.queries, args.seed)
+    logger.info(f"Seeding took {time.perf_counter() - start:.1f}s")
+
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def document_ids(base_url: str) -> List[str]:
+    """Ids of the stored documents, in the order they were seeded."""
+    ids, cursor = [], None
+    while True:
+        response = driver._session().get(
+            f"{base_url}/api/v1/documents", params={"limit": 1000, "cursor": cursor}, timeout=60
+        )
+        response.raise_for_status()
+        page = response.json()
+        ids.extend(doc["file_id"] for doc in page["files"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return ids
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the RAG API and compare with a baseline")
+    parser.add_argument('--url', help="Benchmark a running server instead of starting one")
+    parser.add_argument('--mongo', default='mongomock', help="'mongomock' or a MongoDB URI")
+    parser.add_argument('--db', default='rag_benchmark', help="Database to seed (dropped first)")
+    parser.add_argument('--model', choices=['stub', 'real'], default='stub')
+    parser.add_argument('--token-ms', type=float, default=2.0, help="Stub model cost per generated token")
+    parser.add_argument('--sentiment-ms', type=float, default=1.0, help="Stub model cost per sentiment text")
+    parser.add_argument('--embed-ms', type=float, default=0.5, help="Stub model cost per embedded text")
+    parser.add_argument('--documents', type=int, default=50)
+    parser.add_argument('--words', type=int, default=400, help="Approximate words per document")
+    parser.add_argument('--queries', type=int, default=200, help="Stored queries to seed")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workload', type=Path, default=DEFAULT_WORKLOAD)
+    parser.add_argument('--loop', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--concurrency', type=int, default=8, help="Clients of the closed loop")
+    parser.add_argument('--rate', type=float, help="Open loop: requests/second instead of the recorded arrivals")
+    parser.add_argument('--requests', type=int, help="Requests to send (default: the whole workload)")
+    parser.add_argument('--duration', type=float, help="Stop after this many seconds")
+    parser.add_argument('--warmup', type=int, default=20, help="Requests sent first and not measured")
+    parser.add_argument('--output', type=Path, help="Report path (default: logs/benchmark_report.json)")
+    parser.add_argument('--baseline', type=Path, help="Baseline report to compare with")
+    parser.add_argument('--save-baseline', type=Path, help="Also write the report here as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Allowed relative change before flagging")
+    args = parser.parse_args(argv)
+
+    if not args.workload.exists():
+        workloads.save(workloads.make_workload(documents=args.documents, seed=args.seed), args.workload)
+        logger.info(f"Generated workload {args.workload}")
+    base_url = args.url.rstrip('/') if args.url else start_app(args)
+    entries = workloads.resolve(workloads.load(args.workload), document_ids(base_url))
+
+    if args.warmup:
+        driver.closed_loop(base_url, entries[:args.warmup], concurrency=min(args.concurrency, args.warmup))
+
+    logger.info(f"Running {args.loop}-loop benchmark against {base_url}")
+    start = time.perf_counter()
+    if args.loop == 'closed':
+        results = driver.closed_loop(base_url, entries, args.concurrency, args.requests, args.duration)
+    else:
+        if args.requests:
+            entries = entries[:args.requests]
+        results = driver.open_loop(base_url, entries, rate=args.rate, duration=args.duration)
+    report = driver.summarize(results, time.perf_counter() - start)
+    report["settings"] = {
+        key: str(value) if isinstance(value, Path) else value
+        for key, value in vars(args).items() if key not in ('baseline', 'save_baseline', 'output')
+    }
+
+    logger.info(f"{'endpoint':<18} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind, summary in [*report["endpoints"].items(), ("overall", report["overall"])]:
+        logger.info(
+            f"{kind:<18} {summary['requests']:>6} {summary['errors']:>5} {summary['throughput_rps']:>8} "
+            f"{summary['p50_ms']:>9} {summary['p95_ms']:>9} {summary['p99_ms']:>9}"
+        )
+
+    status = 0
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        changed = [
+            key for key in COMPARABLE_SETTINGS
+            if key in baseline.get("settings", {}) and baseline["settings"][key] != report["settings"][key]
+        ]
+        if changed:
+            logger.warning(f"Baseline was recorded with different settings: {', '.join(changed)}")
+        report["regressions"] = driver.compare(report, baseline, args.tolerance)
+        for regression in report["regressions"]:
+            logger.warning(
+                f"Regression: {regression['endpoint']} {regression['metric']} "
+                f"{regression['baseline']} -> {regression['current']}"
+            )
+        if report["regressions"]:
+            status = 1
+        else:
+            logger.info(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+    from rag.com.config import LOGS_DIR
+    output = args.output or LOGS_DIR / 'benchmark_report.json'
+    output.write_text(json.dumps(report, indent=2))
+    logger.info(f"Report written to {output}")
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(report, indent=2))
+        logger.info(f"Baseline written to {args.save_baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# benchmarks/stub_model.py
+
+import time
+import hashlib
+import threading
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+EMBEDDING_DIM = 64
+
+
+class StubModelManager:
+    """
+    Drop-in replacement for ``ModelManager`` with no model weights.
+
+    Generation returns deterministic text and embeddings are hashes of the
+    words, so results are reproducible. Each call sleeps for a fixed cost
+    per token or text, standing in for inference time, so a benchmark
+    measures the serving path (queueing, MongoDB, GridFS, caches) with a
+    predictable model cost. Set every cost to 0 to measure the serving path
+    alone.
+    """
+
+    COMPONENTS = ('tokenizer', 'generator', 'sentiment', 'embedding')
+
+    def __init__(self, token_ms: float = 2.0, sentiment_ms: float = 1.0, embed_ms: float = 0.5):
+        self.token_ms = token_ms
+        self.sentiment_ms = sentiment_ms
+        self.embed_ms = embed_ms
+        self.calls = {"generate": 0, "generate_stream": 0, "analyze_sentiment": 0, "embed": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, method: str):
+        with self._lock:
+            self.calls[method] += 1
+
+    @staticmethod
+    def _tokens(prompt: str, count: int) -> List[str]:
+        seed = int(hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8], 16)
+        return [f" tok{(seed + i) % 997}" for i in range(count)]
+
+    def generate(self, prompt: str, **params) -> str:
+        self._count("generate")
+        tokens = self._tokens(prompt, params.get('max_new_tokens', 32))
+        time.sleep(len(tokens) * self.token_ms / 1000)
+        return prompt + "".join(tokens)
+
+    def generate_stream(self, prompt: str, stop_event: threading.Event, **params) -> Iterator[str]:
+        self._count("generate_stream")
+        finished = False
+        try:
+            for token in self._tokens(prompt, params.get('max_new_tokens', 32)):
+                if stop_event.is_set():
+                    return
+                time.sleep(self.token_ms / 1000)
+                yield token
+            finished = True
+        finally:
+            if not finished:
+                stop_event.set()
+
+    def analyze_sentiment(self, texts: List[str]) -> List[Dict]:
+        self._count("analyze_sentiment")
+        time.sleep(len(texts) * self.sentiment_ms / 1000)
+        return [{"label": "POSITIVE" if len(text) % 2 else "NEGATIVE", "score": 0.9} for text in texts]
+
+    def embed(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        self._count("embed")
+        time.sleep(len(texts) * self.embed_ms / 1000)
+        vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            # Bag of hashed words, so texts sharing words are similar
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode('utf-8')).hexdigest()[:8], 16) % EMBEDDING_DIM] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+
+    def load(self, names: Optional[List[str]] = None) -> Dict[str, Dict]:
+        return self.status()
+
+    def status(self) -> Dict[str, Dict]:
+        return {name: {"loaded": True, "load_seconds": 0.0, "backend": "stub"} for name in self.COMPONENTS}
+
+    def stats(self) -> Dict:
+        return {"stub_model": dict(self.calls)}
+
+
+def install(document_searcher, model: StubModelManager):
+    """Make a DocumentSearcher, and its semantic cache, use the stub model."""
+    document_searcher.model_manager = model
+    if document_searcher.semantic_cache is not None:
+        document_searcher.semantic_cache.embed = model.embed
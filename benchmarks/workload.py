@@ -0,0 +1,146 @@
+# benchmarks/workload.py
+
+import json
+import random
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from benchmarks.corpus import TOPICS, VOCABULARY
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Request kind -> share of the generated workload
+DEFAULT_MIX = {
+    'generate': 0.15,
+    'generate_stream': 0.05,
+    'search_semantic': 0.2,
+    'search_keyword': 0.2,
+    'search_sentiment': 0.1,
+    'search_batch': 0.05,
+    'list_documents': 0.1,
+    'get_document': 0.1,
+    'download_document': 0.05
+}
+
+# Stands for the id of the n-th seeded document in request paths; see resolve()
+DOCUMENT_PLACEHOLDER = '{document:%d}'
+
+
+def _question(rng: random.Random) -> str:
+    return f"How do I improve {rng.choice(TOPICS)} for {rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)}?"
+
+
+def make_request(kind: str, rng: random.Random, documents: int) -> Dict:
+    """Build one request of the given kind."""
+    document = DOCUMENT_PLACEHOLDER % rng.randrange(documents)
+    if kind in ('generate', 'generate_stream'):
+        body = {"query": _question(rng)}
+        if kind == 'generate_stream':
+            body["stream"] = True
+        return {"kind": kind, "method": "POST", "path": "/api/v1/generate", "body": body}
+    if kind.startswith('search_') and kind != 'search_batch':
+        body = {"query": rng.choice(TOPICS), "mode": 'keyword' if kind == 'search_keyword' else 'semantic'}
+        if kind == 'search_sentiment':
+            body["include_sentiment"] = True
+        return {"kind": kind, "method": "POST", "path": "/api/v1/search", "body": body}
+    if kind == 'search_batch':
+        body = {"queries": rng.sample(TOPICS, 3) + rng.sample(VOCABULARY, 2)}
+        return {"kind": kind, "method": "POST", "path": "/api/v1/search/batch", "body": body}
+    if kind == 'list_documents':
+        return {"kind": kind, "method": "GET", "path": "/api/v1/documents?limit=50"}
+    if kind == 'get_document':
+        return {"kind": kind, "method": "GET", "path": f"/api/v1/documents/{document}"}
+    if kind == 'download_document':
+        return {"kind": kind, "method": "GET", "path": f"/api/v1/documents/{document}/raw"}
+    raise ValueError(f"Unknown request kind: {kind}")
+
+
+def make_workload(
+    requests: int = 500,
+    mix: Optional[Dict[str, float]] = None,
+    documents: int = 50,
+    repeat_ratio: float = 0.2,
+    rate: float = 20.0,
+    seed: int = 0
+) -> List[Dict]:
+    """
+    Build a reproducible request workload.
+
+    Args:
+        requests: Number of requests
+        mix: Share of each request kind (defaults to DEFAULT_MIX)
+        documents: Number of seeded documents the requests refer to
+        repeat_ratio: Share of requests repeating an earlier one, so caches get hits
+        rate: Mean arrival rate (requests/second) of the 'at' offsets used by
+            open-loop replay; arrivals are Poisson
+        seed: Random seed
+
+    Returns:
+        Requests with kind, method, path, optional body and arrival offset 'at' in seconds
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds, weights = list(mix), list(mix.values())
+    workload, at = [], 0.0
+    for _ in range(requests):
+        if workload and rng.random() < repeat_ratio:
+            entry = dict(rng.choice(workload))
+        else:
+            entry = make_request(rng.choices(kinds, weights)[0], rng, documents)
+        at += rng.expovariate(rate)
+        entry["at"] = round(at, 4)
+        workload.append(entry)
+    return workload
+
+
+def save(workload: Iterable[Dict], path: Path):
+    """Write a workload as JSONL, one request per line."""
+    with open(path, 'w') as f:
+        for entry in workload:
+            f.write(json.dumps(entry) + "\n")
+
+
+def load(path: Path) -> List[Dict]:
+    """Read a JSONL workload, skipping blank lines."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def resolve(workload: List[Dict], file_ids: List[str]) -> List[Dict]:
+    """
+    Replace document placeholders in request paths with real file ids.
+
+    The n-th placeholder index maps to file_ids[n % len(file_ids)], so a
+    workload recorded against one corpus replays against any other.
+    """
+    resolved = []
+    for entry in workload:
+        path = entry["path"]
+        if '{document:' in path:
+            if not file_ids:
+                raise ValueError("Workload refers to documents but none are stored")
+            start = path.index('{document:')
+            end = path.index('}', start)
+            index = int(path[start + len('{document:'):end])
+            path = path[:start] + file_ids[index % len(file_ids)] + path[end + 1:]
+        resolved.append({**entry, "path": path})
+    return resolved
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a benchmark workload as JSONL")
+    parser.add_argument('output', type=Path)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--documents', type=int, default=50)
+    parser.add_argument('--repeat-ratio', type=float, default=0.2)
+    parser.add_argument('--rate', type=float, default=20.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    save(make_workload(args.requests, None, args.documents, args.repeat_ratio, args.rate, args.seed), args.output)
+    logger.info(f"Wrote {args.requests} requests to {args.output}")
@@ -1,5 +1,10 @@
 import multiprocessing
 import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
 
 # Server socket
 bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '5000')}"
@@ -7,7 +12,10 @@ backlog = 2048
 
 # Worker processes
 workers = int(os.getenv('WORKERS', multiprocessing.cpu_count() * 2 + 1))
-worker_class = 'sync'
+worker_class = os.getenv('WORKER_CLASS', 'sync')
+# Threads per worker (uses gthread when > 1); concurrent requests in one worker
+# share batched generate calls, see GENERATION_BATCH_WINDOW_MS
+threads = int(os.getenv('THREADS', 1))
 worker_connections = 1000
 timeout = int(os.getenv('TIMEOUT', 120))
 keepalive = 2
@@ -22,6 +30,12 @@ errorlog = 'logs/error.log'
 loglevel = os.getenv('LOG_LEVEL', 'info').lower()
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
 
+# Metrics: workers write Prometheus samples to files here and /metrics aggregates them.
+# Set before the app is imported (preload_app) and emptied so a restart starts from zero.
+prometheus_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', 'logs/prometheus')
+shutil.rmtree(prometheus_dir, ignore_errors=True)
+os.makedirs(prometheus_dir, exist_ok=True)
+
 # Process management
 max_requests = int(os.getenv('MAX_REQUESTS', 1000))
 max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', 50))
@@ -35,4 +49,63 @@ preload_app = True
 # Security
 limit_request_line = 4096
 limit_request_fields = 100
-limit_request_field_size = 8190 
\ No newline at end of file
+limit_request_field_size = 8190 
+
+# Model server (MODEL_SERVER_ENABLED=true): one inference process owns the models
+# and workers forward generate/sentiment/embedding calls to it over a Unix socket
+model_server_process = None
+
+def on_starting(server):
+    global model_server_process
+    if os.getenv('MODEL_SERVER_ENABLED', 'false').lower() != 'true':
+        return
+    from rag.com.config import MODEL_SERVER_SOCKET
+    if os.path.exists(MODEL_SERVER_SOCKET):
+        os.unlink(MODEL_SERVER_SOCKET)
+    model_server_process = subprocess.Popen([sys.executable, '-m', 'rag.com.model_server'])
+    # Wait for the socket so the first requests do not fail while models load
+    deadline = time.monotonic() + int(os.getenv('MODEL_SERVER_STARTUP_TIMEOUT', 300))
+    while not os.path.exists(MODEL_SERVER_SOCKET):
+        if model_server_process.poll() is not None:
+            raise RuntimeError("Model server exited during startup")
+        if time.monotonic() > deadline:
+            raise RuntimeError("Model server did not start in time")
+        time.sleep(0.5)
+    server.log.info(f"Model server started (pid {model_server_process.pid})")
+
+def pre_fork(server, worker):
+    # Workers open their own MongoDB client after fork; drop the one the
+    # master used while importing the app so no sockets are inherited
+    from rag.com.db import close_client
+    close_client()
+
+def post_fork(server, worker):
+    # Without PRELOAD_MODELS, load this worker's models (or the model server's) in the
+    # background so /api/v1/ready turns 200 without waiting for a warmup request
+    from rag.com.config import config
+    if not config['preload_models']:
+        threading.Thread(target=_warmup, args=(server,), name='model-warmup', daemon=True).start()
+
+def _warmup(server):
+    from rag.com import startup
+    from rag.com.utils_ref import warmup
+    try:
+        with startup.phase('model_warmup'):
+            warmup()
+    except Exception as e:
+        server.log.error(f"Model warmup failed, models load on first use: {e}")
+
+def worker_exit(server, worker):
+    # Write the worker's buffered query logs before it exits
+    from rag.com.query_log import close_all
+    close_all(timeout=graceful_timeout / 2)
+
+def child_exit(server, worker):
+    # Drop the live-worker gauges of the exited worker from /metrics
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+def on_exit(server):
+    if model_server_process is not None:
+        model_server_process.terminate()
+        model_server_process.wait(timeout=graceful_timeout)
@@ -4,11 +4,16 @@ db = db.getSiblingDB('queryDB');
 // Create the queries collection
 db.createCollection('queries');
 
-// Create text index on the content field
-db.queries.createIndex(
-    { content: "text" },
-    { default_language: "english" }
-);
+// A collection holds one text index: drop any over other fields, e.g. the old 'content' index
+db.queries.getIndexes().forEach(function (index) {
+    if (index.weights && index.name !== 'query_response_text') {
+        db.queries.dropIndex(index.name);
+    }
+});
 
-// Create any other necessary collections
-db.createCollection('documents'); 
\ No newline at end of file
+// Create text index on the query and response fields written by the application
+// (keep in sync with QUERY_TEXT_INDEX and QUERY_TEXT_WEIGHTS in rag/com/db.py)
+db.queries.createIndex(
+    { query: "text", response: "text" },
+    { name: "query_response_text", weights: { query: 2, response: 1 }, default_language: "english" }
+); 
\ No newline at end of file
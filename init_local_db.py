@@ -1,34 +1,27 @@
-from pymongo import MongoClient
 import logging
 
+from rag.com.config import DB_NAME, config
+from rag.com.db import QUERY_TEXT_INDEX, ensure_indexes, get_database
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def init_database():
     try:
-        # Connect to MongoDB
-        client = MongoClient('mongodb://localhost:27017/')
-        db = client['queryDB']
+        # Connect to MongoDB (MONGO_URI and DB_NAME, as the application does)
+        db = get_database()
         
         # Create collections if they don't exist
-        if 'queries' not in db.list_collection_names():
-            db.create_collection('queries')
-            logger.info("Created 'queries' collection")
-        
-        if 'documents' not in db.list_collection_names():
-            db.create_collection('documents')
-            logger.info("Created 'documents' collection")
-        
-        # Create text index on queries collection
-        db.queries.create_index([('content', 'text')], name='content_text_index')
-        logger.info("Created text index on 'queries' collection")
+        if config['collection_name'] not in db.list_collection_names():
+            db.create_collection(config['collection_name'])
+            logger.info(f"Created '{config['collection_name']}' collection")
         
-        # Create any additional indexes needed
-        db.documents.create_index([('filename', 1)], name='filename_index')
-        logger.info("Created filename index on 'documents' collection")
+        # Create the text index on query and response, replacing any older text index
+        ensure_indexes(db)
+        logger.info(f"Created text index '{QUERY_TEXT_INDEX}' on '{config['collection_name']}' collection")
         
-        logger.info("Database initialization completed successfully")
+        logger.info(f"Database '{DB_NAME}' initialization completed successfully")
         
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
@@ -1,10 +1,14 @@
 # rag/com/app.py
+from rag.com import startup  # first import so the imports phase covers all dependencies
 import os
 import logging
 
+import pymongo
 from flask import Flask
 from flask_cors import CORS
-from rag.com.config import SERVER_CONFIG, LOG_LEVEL
+from rag.com.config import SERVER_CONFIG, LOG_LEVEL, config
+from rag.com.db import ensure_indexes, get_client
+from rag.com import metrics, profiler
 
 # Configure logging
 logging.basicConfig(level=getattr(logging, LOG_LEVEL))
@@ -12,6 +16,8 @@ logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
+metrics.instrument_app(app)
+profiler.instrument_app(app)
 
 # Configure CORS
 if SERVER_CONFIG['cors_origins'] != ['*']:
@@ -27,6 +33,35 @@ else:
 
 # Import routes after app initialization
 from rag.com import routes_ref
+startup.record('imports', startup.since_start())
+
+with startup.phase('mongo_connection'):
+    try:
+        with pymongo.timeout(5):
+            get_client().admin.command('ping')
+        mongo_reachable = True
+    except Exception as e:
+        logger.warning(f"MongoDB is not reachable yet: {e}")
+        mongo_reachable = False
+
+if mongo_reachable:
+    with startup.phase('indexes'):
+        try:
+            ensure_indexes()
+        except Exception as e:
+            logger.warning(f"Could not create MongoDB indexes, query history search needs them: {e}")
+else:
+    logger.warning("Skipping index creation; run init_local_db.py once MongoDB is up")
+
+if config['preload_models'] and config['model_server_enabled']:
+    # The model server preloads its own models, and with gunicorn's preload_app the
+    # app is imported before on_starting launches the server, so it cannot be called yet
+    logger.info("Model server mode: models are preloaded by the model server")
+elif config['preload_models']:
+    with startup.phase('model_preload'):
+        routes_ref.warmup()
+
+startup.log_breakdown()
 
 def start_server():
     """Start the Flask server with configured settings"""
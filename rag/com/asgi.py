@@ -0,0 +1,228 @@
+# rag/com/asgi.py
+"""
+Async serving mode.
+
+Run under an ASGI worker, e.g.
+``WORKER_CLASS=uvicorn_worker.UvicornWorker gunicorn -c gunicorn.conf.py rag.com.asgi:app``.
+
+Document listing and job status read MongoDB through motor and never
+block the event loop. Generation, and search with sentiment, wait in the
+same inference queue as the Flask routes, with the same priorities and
+deadlines; when it is full they answer 429, and when a deadline cannot
+be met 503, both with Retry-After. Other searches run on the thread
+pool, and every other route is served by the Flask app on it.
+"""
+
+import os
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from a2wsgi import WSGIMiddleware
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from rag.com.app import app as flask_app
+from rag.com.config import MONGO_URI, DB_NAME, config
+from rag.com.db import client_options
+from rag.com.executor import ExecutorFull
+from rag.com.routes_ref import (
+    DEFAULT_PAGE_SIZE, admission, encode_event, job_summary, page_args, positive_int, search_args,
+    search_lines, shed_error, stream_events, wants_ndjson, wants_sse
+)
+from rag.com.utils_ref import (
+    DOCUMENT_LIST_PROJECTION, batch_search, document_summary, generate_answer, get_stats,
+    inference_executor as inference, search, stream_answer, stream_search
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    # Created here, in the worker's event loop after fork
+    app.state.mongo = AsyncIOMotorClient(MONGO_URI, **client_options())
+    app.state.db = app.state.mongo[DB_NAME]
+    yield
+    app.state.mongo.close()
+
+
+def too_busy(error: ExecutorFull) -> JSONResponse:
+    body, status, headers = shed_error(error)
+    return JSONResponse(body, status_code=status, headers=headers)
+
+
+async def request_json(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def streaming(lines, stop_event: Optional[threading.Event], media_type: str, encode) -> StreamingResponse:
+    """Stream a blocking iterator from a thread, stopping its producer, if any, when the body ends."""
+    async def body():
+        try:
+            async for line in iterate_in_threadpool(lines):
+                yield encode(line)
+        finally:
+            if stop_event is not None:
+                stop_event.set()
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def list_documents(request: Request) -> Response:
+    """List documents like GET /api/v1/documents, reading GridFS metadata with motor"""
+    ndjson = wants_ndjson(request.query_params, request.headers)
+    try:
+        limit, cursor = page_args(
+            request.query_params.get('limit'), request.query_params.get('cursor'),
+            default=None if ndjson else DEFAULT_PAGE_SIZE
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    spec = {"_id": {"$gt": cursor}} if cursor is not None else {}
+    files = request.app.state.db['fs.files'].find(spec, DOCUMENT_LIST_PROJECTION).sort("_id", 1)
+    if limit:
+        files = files.limit(limit)
+
+    if ndjson:
+        async def lines():
+            async for doc in files:
+                yield json.dumps(document_summary(doc)) + "\n"
+        return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+    summaries = [document_summary(doc) async for doc in files]
+    next_cursor = summaries[-1]["file_id"] if len(summaries) == limit else None
+    return JSONResponse({"files": summaries, "next_cursor": next_cursor})
+
+
+async def get_job(request: Request) -> JSONResponse:
+    """Status and progress of a background ingestion job"""
+    job_id = request.path_params['job_id']
+    if not ObjectId.is_valid(job_id):
+        return JSONResponse({"error": "Invalid job ID format"}, status_code=400)
+    job = await request.app.state.db['ingest_jobs'].find_one({"_id": ObjectId(job_id)})
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse(job_summary(job))
+
+
+async def generate(request: Request) -> Response:
+    """Generate endpoint; inference runs on the bounded executor"""
+    data = await request_json(request)
+    if not data or 'query' not in data:
+        return JSONResponse({"error": "Missing query parameter"}, status_code=400)
+
+    try:
+        admitted = admission(request.headers, data, 'generate')
+        if data.get('stream'):
+            return stream_generation(request, data['query'], admitted)
+        response = await inference.run(generate_answer, data['query'], **admitted)
+    except ExecutorFull as e:
+        return too_busy(e)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"response": response})
+
+
+def stream_generation(request: Request, query: str, admitted: dict) -> StreamingResponse:
+    """
+    Stream tokens as server-sent events or NDJSON, holding one executor worker.
+
+    When the client disconnects the body is cancelled, which sets the stop
+    event and ends generation at the next token, or skips it while queued.
+    """
+    use_sse = wants_sse(request.headers)
+    stop_event = threading.Event()
+    tokens = inference.stream(stream_answer, query, stop_event, stop_event=stop_event, **admitted)
+
+    return streaming(
+        stream_events(tokens), stop_event,
+        'text/event-stream' if use_sse else 'application/x-ndjson',
+        lambda payload: encode_event(payload, use_sse)
+    )
+
+
+async def search_endpoint(request: Request) -> Response:
+    """Search endpoint; searches with include_sentiment run on the bounded executor, others on the thread pool"""
+    data = await request_json(request)
+    if not data or 'query' not in data:
+        return JSONResponse({"error": "Missing query parameter"}, status_code=400)
+
+    try:
+        kwargs = search_args(data)
+        admitted = admission(request.headers, data, 'search') if kwargs['include_sentiment'] else None
+        if data.get('stream') or wants_ndjson(request.query_params, request.headers):
+            if admitted:
+                stop_event = threading.Event()
+                results = inference.stream(stream_search, data['query'], stop_event=stop_event, **admitted, **kwargs)
+            else:
+                stop_event = None
+                results = stream_search(data['query'], **kwargs)
+            return streaming(
+                search_lines(results), stop_event, 'application/x-ndjson',
+                lambda line: json.dumps(line) + "\n"
+            )
+        if admitted:
+            results = await inference.run(search, query=data['query'], **admitted, **kwargs)
+        else:
+            results = await run_in_threadpool(search, query=data['query'], **kwargs)
+    except ExecutorFull as e:
+        return too_busy(e)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse({"results": results})
+
+
+async def batch_search_endpoint(request: Request) -> JSONResponse:
+    """Find every occurrence of a list of queries in one pass over the documents"""
+    data = await request_json(request)
+    queries = data.get('queries') if data else None
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) for q in queries):
+        return JSONResponse({"error": "queries must be a non-empty list of strings"}, status_code=400)
+
+    try:
+        # A scan of stored text with no model calls, so it does not take an inference slot
+        results = await run_in_threadpool(
+            batch_search, queries,
+            filename=data.get('filename'),
+            max_occurrences=positive_int(data.get('max_occurrences'), 'max_occurrences')
+        )
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return JSONResponse(results)
+
+
+async def stats(request: Request) -> JSONResponse:
+    """Runtime statistics for this worker"""
+    worker_stats = await run_in_threadpool(get_stats)
+    return JSONResponse({"pid": os.getpid(), "stats": worker_stats})
+
+
+app = Starlette(
+    routes=[
+        Route('/api/v1/documents', list_documents, methods=['GET']),
+        Route('/api/v1/jobs/{job_id}', get_job, methods=['GET']),
+        Route('/api/v1/generate', generate, methods=['POST']),
+        Route('/api/v1/search', search_endpoint, methods=['POST']),
+        Route('/api/v1/search/batch', batch_search_endpoint, methods=['POST']),
+        Route('/api/v1/stats', stats, methods=['GET']),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=config['wsgi_threads']))
+    ],
+    lifespan=lifespan
+)
@@ -0,0 +1,121 @@
+# rag/com/backends.py
+
+import logging
+from pathlib import Path
+
+import torch
+from transformers import (
+    AutoModelForCausalLM, AutoModelForSequenceClassification, AutoTokenizer, pipeline
+)
+from transformers.pytorch_utils import Conv1D
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# eager: fp32 PyTorch; int8: PyTorch dynamic quantization; onnx: exported ONNX Runtime graphs
+BACKENDS = ('eager', 'int8', 'onnx')
+
+
+def _require_optimum():
+    try:
+        from optimum import onnxruntime
+    except ImportError as e:
+        raise ImportError(
+            "The onnx backend needs optimum[onnxruntime]; install requirements/onnx.txt"
+        ) from e
+    return onnxruntime
+
+
+def _conv1d_to_linear(model: torch.nn.Module) -> torch.nn.Module:
+    """
+    Replace GPT-2's Conv1D projections with equivalent nn.Linear layers.
+
+    Dynamic quantization only rewrites nn.Linear, and GPT-2 implements its
+    attention and MLP projections as Conv1D (a transposed linear layer).
+    """
+    for name, child in model.named_children():
+        if isinstance(child, Conv1D):
+            in_features, out_features = child.weight.shape
+            linear = torch.nn.Linear(in_features, out_features)
+            linear.weight.data = child.weight.data.t().contiguous()
+            linear.bias.data = child.bias.data
+            setattr(model, name, linear)
+        else:
+            _conv1d_to_linear(child)
+    return model
+
+
+def quantize_int8(model: torch.nn.Module) -> torch.nn.Module:
+    """Apply PyTorch dynamic int8 quantization to all linear layers."""
+    model = _conv1d_to_linear(model)
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_causal_lm(model_path: str, backend: str, onnx_dir: Path):
+    """
+    Load the generation model for a backend.
+
+    Args:
+        model_path: Local directory or HuggingFace name of the PyTorch model
+        backend: One of BACKENDS
+        onnx_dir: Directory holding the exported ONNX model (onnx backend only)
+    """
+    if backend == 'onnx':
+        onnxruntime = _require_optimum()
+        if not Path(onnx_dir).exists():
+            raise FileNotFoundError(
+                f"No ONNX export at {onnx_dir}; run EXPORT_ONNX=true python scripts/download_model.py"
+            )
+        logger.info(f"Loading ONNX Runtime generation model from {onnx_dir}")
+        return onnxruntime.ORTModelForCausalLM.from_pretrained(str(onnx_dir))
+
+    model = AutoModelForCausalLM.from_pretrained(model_path)
+    model.eval()
+    if backend == 'int8':
+        logger.info("Quantizing generation model to dynamic int8")
+        model = quantize_int8(model)
+    return model
+
+
+def load_sentiment_pipeline(model_name: str, backend: str, onnx_dir: Path):
+    """Build the sentiment-analysis pipeline for a backend."""
+    if backend == 'eager':
+        return pipeline("sentiment-analysis", model=model_name)
+
+    if backend == 'onnx':
+        onnxruntime = _require_optimum()
+        if not Path(onnx_dir).exists():
+            raise FileNotFoundError(
+                f"No ONNX export at {onnx_dir}; run EXPORT_ONNX=true python scripts/download_model.py"
+            )
+        logger.info(f"Loading ONNX Runtime sentiment model from {onnx_dir}")
+        model = onnxruntime.ORTModelForSequenceClassification.from_pretrained(str(onnx_dir))
+        tokenizer = AutoTokenizer.from_pretrained(str(onnx_dir))
+    else:
+        logger.info("Quantizing sentiment model to dynamic int8")
+        model = quantize_int8(AutoModelForSequenceClassification.from_pretrained(model_name))
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+
+def export_onnx(model_name: str, output_dir: Path, task: str = 'causal-lm'):
+    """
+    Export a HuggingFace model to ONNX with optimum and save it with its tokenizer.
+
+    Args:
+        model_name: Local directory or HuggingFace name of the model
+        output_dir: Directory to write the ONNX graph and tokenizer to
+        task: 'causal-lm' for GPT-2 or 'sequence-classification' for the sentiment model
+    """
+    onnxruntime = _require_optimum()
+    model_class = (
+        onnxruntime.ORTModelForCausalLM if task == 'causal-lm'
+        else onnxruntime.ORTModelForSequenceClassification
+    )
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model_class.from_pretrained(model_name, export=True).save_pretrained(str(output_dir))
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(str(output_dir))
+    return output_dir
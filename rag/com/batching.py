@@ -0,0 +1,148 @@
+# rag/com/batching.py
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+from rag.com import profiler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class _PendingRequest:
+    __slots__ = ('prompt', 'params', 'key', 'future', 'enqueued_at', 'profile')
+
+    def __init__(self, prompt: str, params: Dict[str, Any]):
+        self.prompt = prompt
+        self.params = params
+        self.key = json.dumps(params, sort_keys=True, default=str)
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+        self.profile = profiler.current()
+
+
+class GenerationBatcher:
+    """
+    Dynamic micro-batching scheduler for text generation.
+
+    Callers block in ``submit`` while a single scheduler thread collects the
+    requests that arrive within ``window_ms`` of the first one, up to
+    ``max_batch_size``, and runs them through ``run_batch`` together.
+    Requests with different generation parameters are never mixed: each
+    parameter set inside a window becomes its own batch.
+
+    The scheduler thread is started lazily and restarted after ``fork`` so
+    the batcher can be created before gunicorn forks its workers.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[str], Dict[str, Any]], List[str]],
+        window_ms: float = 10,
+        max_batch_size: int = 8,
+        name: str = 'generation-batcher'
+    ):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._requests = 0
+        self._wait_seconds = 0.0
+
+    def _ensure_running(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # Queue and locks inherited through fork are not shared with the parent
+                self._queue = queue.Queue()
+                self._stats_lock = threading.Lock()
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, prompt: str, params: Dict[str, Any]) -> str:
+        """Queue a prompt and block until its batch has been generated."""
+        if self.max_batch_size <= 1:
+            self._record([1], 0.0)
+            return self.run_batch([prompt], params)[0]
+        self._ensure_running()
+        request = _PendingRequest(prompt, params)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect(self) -> List[_PendingRequest]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups: Dict[str, List[_PendingRequest]] = {}
+            for request in batch:
+                groups.setdefault(request.key, []).append(request)
+
+            started = time.monotonic()
+            self._record(
+                [len(group) for group in groups.values()],
+                sum(started - request.enqueued_at for request in batch)
+            )
+            for group in groups.values():
+                try:
+                    # A batch runs on behalf of every request in it, so it shows in each of their profiles
+                    with ExitStack() as profiles:
+                        for request in group:
+                            profiles.enter_context(profiler.attached(request.profile))
+                        outputs = self.run_batch([request.prompt for request in group], group[0].params)
+                    for request, output in zip(group, outputs):
+                        request.future.set_result(output)
+                except Exception as e:
+                    logger.error(f"Error generating batch of {len(group)}: {e}")
+                    for request in group:
+                        request.future.set_exception(e)
+
+    def _record(self, batch_sizes: List[int], wait_seconds: float):
+        with self._stats_lock:
+            self._batch_sizes.update(batch_sizes)
+            self._requests += sum(batch_sizes)
+            self._wait_seconds += wait_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the distribution of batch sizes achieved so far."""
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_batch_size": self.max_batch_size,
+                "requests": self._requests,
+                "batches": batches,
+                "mean_batch_size": self._requests / batches if batches else None,
+                "mean_queue_wait_ms": self._wait_seconds * 1000.0 / self._requests if self._requests else None,
+                "batch_size_histogram": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                "queue_depth": self._queue.qsize()
+            }
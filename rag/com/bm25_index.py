@@ -0,0 +1,140 @@
+# rag/com/bm25_index.py
+
+import re
+import math
+import heapq
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+
+STATS_ID = "corpus"
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase text and split it into alphanumeric/underscore terms."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def make_snippet(text: str, query: str, length: int = 200) -> str:
+    """Return a window of ``length`` characters starting near the first query term in text."""
+    lowered = text.lower()
+    positions = [lowered.find(term) for term in tokenize(query)]
+    positions = [position for position in positions if position != -1]
+    if not positions or len(text) <= length:
+        return text[:length]
+    start = max(0, min(positions) - length // 4)
+    return text[start:start + length]
+
+
+class BM25Index:
+    """
+    Term-level inverted index with Okapi BM25 ranking stored in MongoDB.
+
+    Each posting is one ``{term, doc_id, tf, dl}`` document, indexed on
+    ``term``, so a query only reads the postings of its own terms. The
+    document length is denormalized into the posting and corpus totals are
+    kept in a single stats document updated with ``$inc``, which lets
+    documents be added incrementally from any worker without a rebuild.
+    """
+
+    def __init__(self, postings_collection, stats_collection, k1: float = 1.2, b: float = 0.75):
+        self.postings = postings_collection
+        self.stats = stats_collection
+        self.k1 = k1
+        self.b = b
+        self._indexes_ready = False
+
+    def _ensure_indexes(self):
+        if not self._indexes_ready:
+            self.postings.create_index([("term", ASCENDING), ("doc_id", ASCENDING)], unique=True)
+            self.postings.create_index("doc_id")
+            self._indexes_ready = True
+
+    def add_documents(self, documents: Iterable[Tuple[object, str]]) -> int:
+        """
+        Add documents to the index.
+
+        Args:
+            documents: Iterable of (doc_id, text) pairs
+
+        Returns:
+            Number of postings written
+        """
+        self._ensure_indexes()
+        postings = []
+        doc_count = 0
+        total_length = 0
+        for doc_id, text in documents:
+            terms = tokenize(text)
+            if not terms:
+                continue
+            doc_count += 1
+            total_length += len(terms)
+            postings.extend(
+                {"term": term, "doc_id": doc_id, "tf": tf, "dl": len(terms)}
+                for term, tf in Counter(terms).items()
+            )
+
+        if postings:
+            self.postings.insert_many(postings, ordered=False)
+            self.stats.update_one(
+                {"_id": STATS_ID},
+                {"$inc": {"doc_count": doc_count, "total_length": total_length}},
+                upsert=True
+            )
+        return len(postings)
+
+    def search(self, query: str, k: int = 5, doc_ids: Optional[List] = None) -> List[Tuple[object, float]]:
+        """
+        Rank documents against a query with BM25.
+
+        Args:
+            query: Free-text query
+            k: Number of hits to return
+            doc_ids: Optional subset of documents to restrict the search to
+
+        Returns:
+            List of (doc_id, score) pairs ordered by score
+        """
+        terms = set(tokenize(query))
+        stats = self.stats.find_one({"_id": STATS_ID})
+        if not terms or not stats or not stats.get("doc_count"):
+            return []
+
+        doc_count = stats["doc_count"]
+        avg_length = stats["total_length"] / doc_count
+
+        # Document frequencies are corpus-wide even when the search is restricted
+        postings_by_term: Dict[str, List[Dict]] = defaultdict(list)
+        document_frequency: Counter = Counter()
+        allowed = set(doc_ids) if doc_ids is not None else None
+        for posting in self.postings.find(
+            {"term": {"$in": list(terms)}},
+            {"_id": 0, "term": 1, "doc_id": 1, "tf": 1, "dl": 1}
+        ):
+            document_frequency[posting["term"]] += 1
+            if allowed is None or posting["doc_id"] in allowed:
+                postings_by_term[posting["term"]].append(posting)
+
+        scores: Dict[object, float] = defaultdict(float)
+        for term, postings in postings_by_term.items():
+            df = document_frequency[term]
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for posting in postings:
+                tf = posting["tf"]
+                norm = self.k1 * (1 - self.b + self.b * posting["dl"] / avg_length)
+                scores[posting["doc_id"]] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def indexed_ids(self) -> set:
+        """Return the ids of all documents that have postings."""
+        return set(self.postings.distinct("doc_id"))
@@ -0,0 +1,363 @@
+# rag/com/cache.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional
+
+from rag.com.metrics import lookup_counts
+
+
+def text_key(text: str) -> str:
+    """Return a stable hash of text for use as a cache key."""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe bounded LRU mapping with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Return size and hit-ratio counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None
+        }
+
+
+class ByteLRUCache:
+    """
+    Thread-safe LRU mapping bounded by the total size of its values.
+
+    Callers pass each value's size in bytes; least recently used entries are
+    evicted until the total fits ``max_bytes``. Values larger than the whole
+    budget are not cached. ``bytes_saved`` sums the sizes of values served
+    from the cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                value, size = self._data[key]
+                self.hits += 1
+                self.bytes_saved += size
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any, size: int):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self.bytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            value, size = self._data.pop(key)
+            self.bytes -= size
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """Return size, hit-ratio and bytes-saved counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved
+        }
+
+
+def response_cache_key(query: str, template: str, params: Dict[str, Any]) -> str:
+    """
+    Build a response cache key from the normalized query, the prompt template
+    and the generation parameters.
+    """
+    normalized = " ".join(query.lower().split())
+    payload = json.dumps(
+        {"query": normalized, "template": template, "params": params},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Base class for generated-response caches shared by all workers.
+
+    Entries expire ``ttl`` seconds after being written and the least recently
+    used entries are evicted once more than ``max_entries`` are stored.
+    Hit/miss counters are kept per process and across workers.
+    """
+
+    def __init__(self, ttl: int = 86400, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+            self._count('misses')
+        else:
+            self.hits += 1
+            self._count('hits')
+        return value
+
+    def put(self, key: str, value: str):
+        self._put(key, value)
+        self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        shared = self._shared_counters()
+        shared_lookups = shared.get('hits', 0) + shared.get('misses', 0)
+        return {
+            "backend": self.backend,
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "entries": self._size(),
+            "worker": {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else None
+            },
+            "shared": {
+                "hits": shared.get('hits', 0),
+                "misses": shared.get('misses', 0),
+                "hit_ratio": shared.get('hits', 0) / shared_lookups if shared_lookups else None
+            }
+        }
+
+    def _get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def _put(self, key: str, value: str):
+        raise NotImplementedError
+
+    def _evict(self):
+        raise NotImplementedError
+
+    def _size(self) -> int:
+        raise NotImplementedError
+
+    def _count(self, counter: str):
+        raise NotImplementedError
+
+    def _shared_counters(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+
+class MongoResponseCache(ResponseCache):
+    """
+    Response cache stored in a MongoDB collection.
+
+    Expiry is delegated to a TTL index on ``expires_at``; reads refresh
+    ``last_access`` which drives LRU eviction when the collection exceeds
+    ``max_entries``. Hits and misses are not written to MongoDB, which would
+    add a round trip to every lookup; the shared counts are those of the
+    ``rag_cache_lookups`` metrics of all workers.
+    """
+
+    backend = 'mongo'
+
+    def __init__(self, collection, ttl: int = 86400, max_entries: int = 10000):
+        super().__init__(ttl, max_entries)
+        self.collection = collection
+        self._indexes_ready = False
+
+    def _ensure_indexes(self):
+        if not self._indexes_ready:
+            self.collection.create_index('expires_at', expireAfterSeconds=0)
+            self.collection.create_index('last_access')
+            self._indexes_ready = True
+
+    def _get(self, key: str) -> Optional[str]:
+        now = datetime.utcnow()
+        doc = self.collection.find_one_and_update(
+            {"_id": key, "expires_at": {"$gt": now}},
+            {"$set": {"last_access": now}},
+            projection={"response": 1}
+        )
+        return doc["response"] if doc else None
+
+    def _put(self, key: str, value: str):
+        self._ensure_indexes()
+        now = datetime.utcnow()
+        self.collection.replace_one(
+            {"_id": key},
+            {
+                "response": value,
+                "created_at": now,
+                "last_access": now,
+                "expires_at": now + timedelta(seconds=self.ttl)
+            },
+            upsert=True
+        )
+
+    def _evict(self):
+        excess = self.collection.estimated_document_count() - self.max_entries
+        if excess > 0:
+            stale = [doc["_id"] for doc in self.collection.find({}, {"_id": 1}).sort("last_access", 1).limit(excess)]
+            self.collection.delete_many({"_id": {"$in": stale}})
+
+    def _size(self) -> int:
+        return self.collection.estimated_document_count()
+
+    def _count(self, counter: str):
+        pass
+
+    def _shared_counters(self) -> Dict[str, int]:
+        return lookup_counts('response')
+
+
+class DiskResponseCache(ResponseCache):
+    """
+    Response cache stored in a local SQLite file shared by the workers of one host.
+
+    Each thread opens its own connection (reopened after fork); WAL mode
+    lets readers proceed while another worker writes.
+    """
+
+    backend = 'disk'
+
+    def __init__(self, path: Path, ttl: int = 86400, max_entries: int = 10000):
+        super().__init__(ttl, max_entries)
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, response TEXT, last_access REAL, expires_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            connection.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT response FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _put(self, key: str, value: str):
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO entries (key, response, last_access, expires_at) VALUES (?, ?, ?, ?)",
+            (key, value, now, now + self.ttl)
+        )
+
+    def _evict(self):
+        connection = self._connection()
+        connection.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        connection.execute(
+            "DELETE FROM entries WHERE key IN ("
+            "SELECT key FROM entries ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def _size(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _count(self, counter: str):
+        self._connection().execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (counter,)
+        )
+
+    def _shared_counters(self) -> Dict[str, int]:
+        return dict(self._connection().execute("SELECT name, value FROM counters").fetchall())
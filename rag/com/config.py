@@ -3,7 +3,6 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from pymongo import MongoClient
 
 # Load environment variables from .env file
 load_dotenv()
@@ -34,10 +33,15 @@ DEFAULT_MODEL_SETTINGS = {
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 DB_NAME = os.getenv('DB_NAME', 'queryDB')
 
-# Initialize MongoDB connection
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-collection = db['queries']
+# MongoDB connection pool (one client per process, created after fork; see rag/com/db.py)
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '20'))    # Connections per worker process
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))     # Connections kept open while idle
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '60000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))  # Max wait for a free connection
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '10000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '0'))  # 0 waits indefinitely
+MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', 'zlib')  # Comma-separated: zstd, snappy, zlib; empty disables
 
 # Model Configuration (with defaults)
 MODEL_DIR = MODELS_DIR / DEFAULT_MODEL_SETTINGS['MODEL_NAME_LOCAL']
@@ -45,6 +49,86 @@ MODEL_NAME_LOCAL = os.getenv('MODEL_NAME_LOCAL', DEFAULT_MODEL_SETTINGS['MODEL_N
 MODEL_NAME_REMOTE = os.getenv('MODEL_NAME_REMOTE', DEFAULT_MODEL_SETTINGS['MODEL_NAME_REMOTE'])
 USE_LOCAL_MODEL = os.getenv('USE_LOCAL_MODEL', str(DEFAULT_MODEL_SETTINGS['USE_LOCAL_MODEL'])).lower() == 'true'
 
+# Retrieval Configuration
+INDEX_DIR = Path(os.getenv('INDEX_DIR', str(DATA_DIR / 'index')))
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'sentence-transformers/all-MiniLM-L6-v2')
+CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', '500'))        # Characters per indexed chunk
+CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', '100'))  # Characters shared by consecutive chunks
+SEARCH_TOP_K = int(os.getenv('SEARCH_TOP_K', '5'))      # Default number of ranked chunks returned
+QUERY_RESULTS_LIMIT = int(os.getenv('QUERY_RESULTS_LIMIT', '10'))  # Default page of stored queries per search
+QUERY_RESULTS_MAX_TIME_MS = int(os.getenv('QUERY_RESULTS_MAX_TIME_MS', '2000'))  # Query-history search time limit; 0 for none
+BATCH_SEARCH_MAX_QUERIES = int(os.getenv('BATCH_SEARCH_MAX_QUERIES', '100'))        # Queries per /search/batch call
+BATCH_SEARCH_MAX_OCCURRENCES = int(os.getenv('BATCH_SEARCH_MAX_OCCURRENCES', '50'))  # Occurrences returned per query
+
+# Ingestion Configuration
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '2'))            # Background indexing threads per worker
+INGEST_MAX_PENDING = int(os.getenv('INGEST_MAX_PENDING', '32'))   # Queued jobs per worker before uploads get 503
+INGEST_EMBED_BATCH = int(os.getenv('INGEST_EMBED_BATCH', '64'))   # Chunks embedded and indexed per progress step
+DOCUMENT_CACHE_BYTES = int(os.getenv('DOCUMENT_CACHE_BYTES', str(64 * 1024 * 1024)))  # Decoded text cached per worker, 0 disables
+
+# Sentiment Configuration
+SENTIMENT_BATCH_SIZE = int(os.getenv('SENTIMENT_BATCH_SIZE', '32'))    # Snippets per forward pass
+SENTIMENT_CACHE_SIZE = int(os.getenv('SENTIMENT_CACHE_SIZE', '4096'))  # Cached snippet scores per worker
+
+# Generation Configuration
+MAX_NEW_TOKENS = int(os.getenv('MAX_NEW_TOKENS', '120'))                         # Tokens generated per answer
+GENERATION_BATCH_WINDOW_MS = float(os.getenv('GENERATION_BATCH_WINDOW_MS', '10'))  # Time to wait for more requests
+GENERATION_MAX_BATCH_SIZE = int(os.getenv('GENERATION_MAX_BATCH_SIZE', '8'))     # 1 disables micro-batching
+PREFIX_CACHE_ENABLED = os.getenv('PREFIX_CACHE_ENABLED', 'true').lower() == 'true'  # Reuse KV cache of template prefixes
+
+# Response Cache Configuration
+RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'mongo').lower()   # mongo, disk or none
+RESPONSE_CACHE_PATH = Path(os.getenv('RESPONSE_CACHE_PATH', str(DATA_DIR / 'response_cache.sqlite3')))
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '86400'))              # Seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+# Sampled generations (do_sample=True) differ per call; caching them replays one sample until it expires
+RESPONSE_CACHE_SAMPLED = os.getenv('RESPONSE_CACHE_SAMPLED', 'true').lower() == 'true'
+
+# Semantic Cache Configuration
+SEMANTIC_CACHE_ENABLED = os.getenv('SEMANTIC_CACHE_ENABLED', 'true').lower() == 'true'
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92'))  # Minimum cosine similarity for a hit
+
+# Inference backend for GPT-2 and the sentiment model: eager (fp32), int8 (dynamic quantization) or onnx
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'eager').lower()
+ONNX_MODELS_DIR = Path(os.getenv('ONNX_MODELS_DIR', str(MODELS_DIR / 'onnx')))
+
+# Load all models at startup instead of on first use (before fork with preload_app)
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'false').lower() == 'true'
+
+# Model Server Configuration
+# When enabled, one process owns the models and gunicorn workers forward inference to it
+MODEL_SERVER_ENABLED = os.getenv('MODEL_SERVER_ENABLED', 'false').lower() == 'true'
+MODEL_SERVER_SOCKET = os.getenv('MODEL_SERVER_SOCKET', str(DATA_DIR / 'model_server.sock'))
+MODEL_SERVER_AUTHKEY = os.getenv('MODEL_SERVER_AUTHKEY', 'rag-model-server').encode('utf-8')
+
+# Inference Admission Configuration
+# Generation and sentiment search wait in a priority queue; a request that cannot
+# start before its deadline is shed with 503. A deadline of 0 disables shedding.
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '2'))          # Concurrent inference calls per worker
+INFERENCE_QUEUE_SIZE = int(os.getenv('INFERENCE_QUEUE_SIZE', '16'))   # Waiting calls before 429 responses
+GENERATE_DEADLINE_MS = int(os.getenv('GENERATE_DEADLINE_MS', '30000'))  # Default deadline of /generate
+SEARCH_DEADLINE_MS = int(os.getenv('SEARCH_DEADLINE_MS', '10000'))      # Default deadline of /search
+GENERATE_PRIORITY = os.getenv('GENERATE_PRIORITY', 'normal').lower()    # high, normal or low
+SEARCH_PRIORITY = os.getenv('SEARCH_PRIORITY', 'high').lower()
+
+# Async Serving Configuration (rag.com.asgi:app under an ASGI worker)
+WSGI_THREADS = int(os.getenv('WSGI_THREADS', '10'))                   # Threads for routes still served by Flask
+
+# Query Log Configuration
+# Query/response records are buffered per worker and written with insert_many
+QUERY_LOG_BATCH_SIZE = int(os.getenv('QUERY_LOG_BATCH_SIZE', '100'))   # Records per write; 1 writes synchronously
+QUERY_LOG_FLUSH_MS = float(os.getenv('QUERY_LOG_FLUSH_MS', '500'))     # Longest a record waits before a write
+QUERY_LOG_MAX_BUFFER = int(os.getenv('QUERY_LOG_MAX_BUFFER', '10000')) # Oldest records are dropped beyond this
+
+# Profiling Configuration
+# Requests sending PROFILE_TOKEN in an X-Profile header or ?profile= are profiled;
+# an empty token disables on-demand profiling.
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0.0'))  # Share of all requests profiled, 0 to 1
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))    # Stack sampling interval
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', str(LOGS_DIR / 'profiles')))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '200'))        # Oldest profiles are deleted beyond this
+
 # API Configuration
 API_HOST = os.getenv('API_HOST', '0.0.0.0')  # 0.0.0.0 for all interfaces, 127.0.0.1 for localhost only
 API_PORT = int(os.getenv('API_PORT', '5000'))
@@ -72,7 +156,63 @@ config = {
     'model_cache_dir': DEFAULT_MODEL_SETTINGS['MODEL_CACHE_DIR'],
     'mongo_uri': MONGO_URI,
     'db_name': DB_NAME,
-    'collection_name': 'queries'
+    'collection_name': 'queries',
+    'mongo_max_pool_size': MONGO_MAX_POOL_SIZE,
+    'mongo_min_pool_size': MONGO_MIN_POOL_SIZE,
+    'mongo_max_idle_time_ms': MONGO_MAX_IDLE_TIME_MS,
+    'mongo_wait_queue_timeout_ms': MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    'mongo_connect_timeout_ms': MONGO_CONNECT_TIMEOUT_MS,
+    'mongo_server_selection_timeout_ms': MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    'mongo_socket_timeout_ms': MONGO_SOCKET_TIMEOUT_MS,
+    'mongo_compressors': MONGO_COMPRESSORS,
+    'embedding_model_name': EMBEDDING_MODEL_NAME,
+    'index_dir': str(INDEX_DIR),
+    'chunk_size': CHUNK_SIZE,
+    'chunk_overlap': CHUNK_OVERLAP,
+    'search_top_k': SEARCH_TOP_K,
+    'query_results_limit': QUERY_RESULTS_LIMIT,
+    'query_results_max_time_ms': QUERY_RESULTS_MAX_TIME_MS,
+    'batch_search_max_queries': BATCH_SEARCH_MAX_QUERIES,
+    'batch_search_max_occurrences': BATCH_SEARCH_MAX_OCCURRENCES,
+    'ingest_workers': INGEST_WORKERS,
+    'ingest_max_pending': INGEST_MAX_PENDING,
+    'ingest_embed_batch': INGEST_EMBED_BATCH,
+    'document_cache_bytes': DOCUMENT_CACHE_BYTES,
+    'sentiment_batch_size': SENTIMENT_BATCH_SIZE,
+    'sentiment_cache_size': SENTIMENT_CACHE_SIZE,
+    'max_new_tokens': MAX_NEW_TOKENS,
+    'generation_batch_window_ms': GENERATION_BATCH_WINDOW_MS,
+    'generation_max_batch_size': GENERATION_MAX_BATCH_SIZE,
+    'prefix_cache_enabled': PREFIX_CACHE_ENABLED,
+    'response_cache_backend': RESPONSE_CACHE_BACKEND,
+    'response_cache_path': str(RESPONSE_CACHE_PATH),
+    'response_cache_ttl': RESPONSE_CACHE_TTL,
+    'response_cache_max_entries': RESPONSE_CACHE_MAX_ENTRIES,
+    'response_cache_sampled': RESPONSE_CACHE_SAMPLED,
+    'semantic_cache_enabled': SEMANTIC_CACHE_ENABLED,
+    'semantic_cache_threshold': SEMANTIC_CACHE_THRESHOLD,
+    'inference_backend': INFERENCE_BACKEND,
+    'onnx_generator_dir': str(ONNX_MODELS_DIR / 'gpt2'),
+    'onnx_sentiment_dir': str(ONNX_MODELS_DIR / 'sentiment'),
+    'preload_models': PRELOAD_MODELS,
+    'model_server_enabled': MODEL_SERVER_ENABLED,
+    'model_server_socket': MODEL_SERVER_SOCKET,
+    'model_server_authkey': MODEL_SERVER_AUTHKEY,
+    'inference_workers': INFERENCE_WORKERS,
+    'inference_queue_size': INFERENCE_QUEUE_SIZE,
+    'generate_deadline_ms': GENERATE_DEADLINE_MS,
+    'search_deadline_ms': SEARCH_DEADLINE_MS,
+    'generate_priority': GENERATE_PRIORITY,
+    'search_priority': SEARCH_PRIORITY,
+    'wsgi_threads': WSGI_THREADS,
+    'query_log_batch_size': QUERY_LOG_BATCH_SIZE,
+    'query_log_flush_ms': QUERY_LOG_FLUSH_MS,
+    'query_log_max_buffer': QUERY_LOG_MAX_BUFFER,
+    'profile_token': PROFILE_TOKEN,
+    'profile_sample_rate': PROFILE_SAMPLE_RATE,
+    'profile_interval_ms': PROFILE_INTERVAL_MS,
+    'profile_dir': str(PROFILE_DIR),
+    'profile_max_files': PROFILE_MAX_FILES
 }
 
 # Logging Configuration
@@ -81,6 +221,6 @@ LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 # Export all necessary variables
 __all__ = [
     'API_HOST', 'API_PORT', 'DEBUG_MODE', 'SERVER_CONFIG',
-    'MONGO_URI', 'DB_NAME', 'collection', 'db',
+    'MONGO_URI', 'DB_NAME',
     'config', 'LOG_LEVEL', 'ALLOWED_HOSTS', 'CORS_ORIGINS'
 ]
\ No newline at end of file
@@ -1,18 +1,272 @@
-from pymongo import MongoClient
-from pymongo.errors import ConnectionError
+# rag/com/db.py
+
+import os
 import time
 import logging
-from rag.com.config import MONGO_URI, DB_NAME
+import threading
+from typing import Dict, Optional
+
+import gridfs
+from pymongo import TEXT, MongoClient, monitoring
+from pymongo.errors import ConnectionFailure
+
+from rag.com.config import MONGO_URI, DB_NAME, config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Text index of stored queries; a match in the question counts more than one in the answer
+QUERY_TEXT_INDEX = 'query_response_text'
+QUERY_TEXT_WEIGHTS = {"query": 2, "response": 1}
+
+# Upper bounds (ms) of the checkout-latency histogram buckets
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener recording checkout latency and pool usage.
+
+    Checkout latency is the time a thread waits for a pooled connection,
+    including connection establishment when the pool has to grow; a high
+    latency with ``waiting`` > 0 means the pool is too small for the
+    worker's concurrency. Failed checkouts (e.g. waitQueueTimeoutMS) are
+    counted by reason.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.checkout_seconds = 0.0
+        self.max_checkout_seconds = 0.0
+        self.histogram = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+        self.failures: Dict[str, int] = {}
+        self.waiting = 0
+        self.checked_out = 0
+        self.open_connections = 0
+        self.created = 0
+
+    def _finish_wait(self) -> float:
+        started = getattr(self._local, 'started', None)
+        self._local.started = None
+        self.waiting -= 1
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            seconds = self._finish_wait()
+            self.checkouts += 1
+            self.checked_out += 1
+            self.checkout_seconds += seconds
+            self.max_checkout_seconds = max(self.max_checkout_seconds, seconds)
+            bucket = next(
+                (i for i, bound in enumerate(CHECKOUT_BUCKETS_MS) if seconds * 1000 <= bound),
+                len(CHECKOUT_BUCKETS_MS)
+            )
+            self.histogram[bucket] += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._finish_wait()
+            reason = str(event.reason)
+            self.failures[reason] = self.failures.get(reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> Dict:
+        """Return checkout latency and pool occupancy counters."""
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in CHECKOUT_BUCKETS_MS] + [f">{CHECKOUT_BUCKETS_MS[-1]}ms"]
+            return {
+                "checkouts": self.checkouts,
+                "mean_checkout_ms": (
+                    round(self.checkout_seconds / self.checkouts * 1000, 3) if self.checkouts else None
+                ),
+                "max_checkout_ms": round(self.max_checkout_seconds * 1000, 3),
+                "checkout_histogram": dict(zip(labels, self.histogram)),
+                "checkout_failures": dict(self.failures),
+                "waiting": self.waiting,
+                "checked_out": self.checked_out,
+                "open_connections": self.open_connections,
+                "connections_created": self.created
+            }
+
+
+_client: Optional[MongoClient] = None
+_client_pid: Optional[int] = None
+_metrics: Optional[PoolMetrics] = None
+_gridfs: Dict[str, gridfs.GridFS] = {}
+_lock = threading.Lock()
+
+
+def client_options() -> Dict:
+    """MongoClient keyword arguments built from the MONGO_* settings."""
+    options = {
+        'maxPoolSize': config['mongo_max_pool_size'],
+        'minPoolSize': config['mongo_min_pool_size'],
+        'maxIdleTimeMS': config['mongo_max_idle_time_ms'],
+        'waitQueueTimeoutMS': config['mongo_wait_queue_timeout_ms'],
+        'connectTimeoutMS': config['mongo_connect_timeout_ms'],
+        'serverSelectionTimeoutMS': config['mongo_server_selection_timeout_ms'],
+        'socketTimeoutMS': config['mongo_socket_timeout_ms'] or None
+    }
+    if config['mongo_compressors']:
+        options['compressors'] = config['mongo_compressors']
+    return options
+
 
-def get_db_connection(max_retries=3, retry_delay=5):
-    """Get MongoDB connection with retry logic"""
+def get_client() -> MongoClient:
+    """
+    Return this process's MongoClient, creating it on first use.
+
+    A client created before fork (e.g. while gunicorn imports the app with
+    preload_app) is never reused in the child: each process gets its own
+    client and connection pool, sized by MONGO_MAX_POOL_SIZE.
+    """
+    global _client, _client_pid, _metrics
+    if _client_pid != os.getpid():
+        with _lock:
+            if _client_pid != os.getpid():
+                _metrics = PoolMetrics()
+                _client = MongoClient(MONGO_URI, event_listeners=[_metrics], **client_options())
+                _gridfs.clear()
+                _client_pid = os.getpid()
+    return _client
+
+
+def close_client():
+    """Close this process's client; the next use creates a new one."""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+        _gridfs.clear()
+
+
+def get_database():
+    """Return the application database on this process's client."""
+    return get_client()[DB_NAME]
+
+
+def get_gridfs(bucket: str = 'fs') -> gridfs.GridFS:
+    """Return a GridFS bucket on this process's client."""
+    get_client()
+    fs = _gridfs.get(bucket)
+    if fs is None:
+        fs = _gridfs[bucket] = gridfs.GridFS(get_database(), collection=bucket)
+    return fs
+
+
+def ensure_indexes(database=None):
+    """
+    Create the indexes the request path relies on; safe to run on every start.
+
+    A collection can hold only one text index, so a text index over other
+    fields or with other weights (such as the 'content' index created by
+    older setup scripts) is dropped and rebuilt over query and response.
+
+    Args:
+        database: Database to index (defaults to this process's DB_NAME database)
+    """
+    database = database if database is not None else get_database()
+    queries = database[config['collection_name']]
+    for name, spec in queries.index_information().items():
+        is_text = any(kind == TEXT for _, kind in spec['key'])
+        if is_text and (name != QUERY_TEXT_INDEX or spec.get('weights') != QUERY_TEXT_WEIGHTS):
+            logger.info(f"Dropping text index {name} of {queries.name}")
+            queries.drop_index(name)
+    queries.create_index(
+        [("query", TEXT), ("response", TEXT)],
+        name=QUERY_TEXT_INDEX,
+        weights=QUERY_TEXT_WEIGHTS,
+        default_language='english'
+    )
+
+
+def pool_stats() -> Dict:
+    """Return pool settings and checkout metrics of this process's client."""
+    get_client()
+    return {"pid": os.getpid(), "options": client_options(), **_metrics.stats()}
+
+
+def wait_for_connection(max_retries: int = 3, retry_delay: float = 5) -> bool:
+    """Ping MongoDB until it answers, retrying on connection failures."""
     for attempt in range(max_retries):
         try:
-            client = MongoClient(MONGO_URI)
-            client.server_info()  # Test connection
-            return client[DB_NAME]
-        except ConnectionError as e:
+            get_client().admin.command('ping')
+            return True
+        except ConnectionFailure:
             if attempt == max_retries - 1:
                 raise
-            logging.warning(f"MongoDB connection attempt {attempt + 1} failed. Retrying...")
-            time.sleep(retry_delay) 
\ No newline at end of file
+            logger.warning(f"MongoDB connection attempt {attempt + 1} failed. Retrying...")
+            time.sleep(retry_delay)
+    return False
+
+
+class LazyCollection:
+    """
+    Collection handle that resolves against the current process's client on every use.
+
+    Safe to create at import time and to keep across fork.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attribute):
+        return getattr(get_database()[self.name], attribute)
+
+    def __getitem__(self, name: str) -> 'LazyCollection':
+        return LazyCollection(f"{self.name}.{name}")
+
+    def __repr__(self) -> str:
+        return f"LazyCollection({self.name!r})"
+
+
+class LazyDatabase:
+    """Database handle whose collections are LazyCollections."""
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        return LazyCollection(name)
+
+    def __getattr__(self, attribute):
+        return getattr(get_database(), attribute)
+
+
+db = LazyDatabase()
+collection = db[config['collection_name']]
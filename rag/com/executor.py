@@ -0,0 +1,339 @@
+# rag/com/executor.py
+
+import os
+import math
+import time
+import heapq
+import queue
+import asyncio
+import itertools
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, Iterator, List, Optional
+
+from rag.com import profiler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Lower runs first; within a priority the earliest deadline runs first
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+
+class ExecutorFull(Exception):
+    """Raised when the inference executor has no room; carries a Retry-After estimate."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(ExecutorFull):
+    """Raised when a call is shed because it cannot start before its deadline."""
+
+
+class _Job:
+    __slots__ = ('fn', 'args', 'kwargs', 'future', 'deadline', 'enqueued', 'profile')
+
+    def __init__(self, fn, args, kwargs, deadline):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.deadline = deadline
+        self.enqueued = time.monotonic()
+        self.profile = profiler.current()
+
+
+class BoundedExecutor:
+    """
+    Priority queue and worker threads in front of blocking inference calls.
+
+    At most ``max_workers`` calls run and ``max_queue`` wait. Waiting calls
+    are ordered by priority, then by earliest deadline. A call is shed
+    instead of run when:
+
+    - both limits are taken (ExecutorFull, with a Retry-After estimated from
+      recent service times);
+    - the estimated queue wait already exceeds its deadline on admission
+      (DeadlineExceeded);
+    - its deadline passes while it waits (its future fails with DeadlineExceeded).
+      Expired calls are dropped, freeing their slots, whenever a call is
+      submitted or a worker looks for work; ``call`` gives up at the
+      deadline itself.
+
+    Futures cancelled while queued, e.g. for a disconnected client, are
+    dropped without running. Worker threads start lazily, and again after fork.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16, name: str = 'inference'):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.name = name
+        self.in_flight = 0
+        self.running = 0
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.shed = {"admission": 0, "expired": 0}
+        self.mean_service_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._heap = []
+        self._sequence = itertools.count()
+        self._pid = None
+        self._condition = threading.Condition()
+
+    def _ensure_workers(self):
+        if self._pid != os.getpid():
+            with self._condition:
+                if self._pid != os.getpid():
+                    # Threads do not survive fork, and neither do the calls they held
+                    self._heap = []
+                    self.in_flight = self.running = 0
+                    for index in range(self.max_workers):
+                        threading.Thread(target=self._work, name=f"{self.name}-{index}", daemon=True).start()
+                    self._pid = os.getpid()
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from the mean service time."""
+        waves = math.ceil((self.in_flight + 1) / self.max_workers)
+        return max(1, math.ceil(waves * self.mean_service_seconds))
+
+    def _estimated_wait(self, priority: int) -> float:
+        """Expected queue wait of a new call: the calls ahead of it, spread over the workers."""
+        ahead = self.running + sum(1 for entry in self._heap if entry[0] <= priority)
+        return (ahead // self.max_workers) * self.mean_service_seconds
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        priority: int = PRIORITIES['normal'],
+        deadline: Optional[float] = None,
+        **kwargs
+    ) -> Future:
+        """
+        Queue a blocking call and return its future.
+
+        Args:
+            fn: The blocking callable, called with the remaining arguments
+            priority: One of the PRIORITIES values
+            deadline: ``time.monotonic()`` value after which the call is no longer wanted
+
+        Raises:
+            ExecutorFull: If max_workers + max_queue calls are already in flight
+            DeadlineExceeded: If the call is not expected to start before its deadline
+        """
+        self._ensure_workers()
+        with self._condition:
+            expired = self._purge()
+            if self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorFull(f"{self.name} queue is full", self.retry_after())
+            if deadline is not None and time.monotonic() + self._estimated_wait(priority) > deadline:
+                self.shed["admission"] += 1
+                raise DeadlineExceeded(f"{self.name} queue wait exceeds the deadline", self.retry_after())
+
+            job = _Job(fn, args, kwargs, deadline)
+            heapq.heappush(
+                self._heap,
+                (priority, math.inf if deadline is None else deadline, next(self._sequence), job)
+            )
+            self.in_flight += 1
+            self.submitted += 1
+            self._condition.notify()
+        self._fail_expired(expired)
+        return job.future
+
+    def _purge(self) -> List[_Job]:
+        """
+        Drop queued calls that were cancelled or whose deadline passed, releasing their slots.
+
+        Called with the condition held. Returns the expired jobs, whose
+        futures the caller fails once the condition is released.
+        """
+        now = time.monotonic()
+        kept, expired = [], []
+        for entry in self._heap:
+            job = entry[-1]
+            if job.deadline is not None and now > job.deadline:
+                expired.append(job)
+            elif job.future.cancelled():
+                self.cancelled += 1
+            else:
+                kept.append(entry)
+                continue
+            self.in_flight -= 1
+        if len(kept) != len(self._heap):
+            heapq.heapify(kept)
+            self._heap = kept
+        self.shed["expired"] += len(expired)
+        return expired
+
+    def _fail_expired(self, jobs: List[_Job]):
+        now = time.monotonic()
+        for job in jobs:
+            if job.future.set_running_or_notify_cancel():
+                job.future.set_exception(DeadlineExceeded(
+                    f"Deadline passed after {now - job.enqueued:.2f}s in the {self.name} queue",
+                    self.retry_after()
+                ))
+
+    def _work(self):
+        while True:
+            with self._condition:
+                expired = self._purge()
+                job = heapq.heappop(self._heap)[-1] if self._heap else None
+                if job is None and not expired:
+                    self._condition.wait()
+            self._fail_expired(expired)
+            if job is None:
+                continue
+
+            now = time.monotonic()
+            if not job.future.set_running_or_notify_cancel():
+                self._finish(cancelled=True)
+                continue
+            if job.deadline is not None and now > job.deadline:
+                self._finish(expired=True)
+                job.future.set_exception(DeadlineExceeded(
+                    f"Deadline passed after {now - job.enqueued:.2f}s in the {self.name} queue",
+                    self.retry_after()
+                ))
+                continue
+
+            with self._condition:
+                wait = now - job.enqueued
+                self.running += 1
+                self.started += 1
+                self.wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            result = error = None
+            try:
+                with profiler.attached(job.profile):
+                    result = job.fn(*job.args, **job.kwargs)
+            except BaseException as e:
+                error = e
+            # Counted before the caller wakes up, so stats never lag the response
+            self._finish(service_seconds=time.monotonic() - now)
+            if error is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(error)
+
+    def _finish(self, service_seconds: float = 0.0, cancelled: bool = False, expired: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if cancelled:
+                self.cancelled += 1
+            elif expired:
+                self.shed["expired"] += 1
+            else:
+                self.running -= 1
+                self.completed += 1
+                # Exponentially weighted, so the estimate follows load changes
+                self.mean_service_seconds += 0.1 * (service_seconds - self.mean_service_seconds)
+
+    def call(self, fn: Callable, *args, deadline: Optional[float] = None, **kwargs):
+        """
+        Run a blocking call through the queue and wait for its result.
+
+        If the call has not started by its deadline it is cancelled and
+        DeadlineExceeded is raised at once; a call that has started runs to
+        completion, since the deadline only bounds the queue wait.
+        """
+        future = self.submit(fn, *args, deadline=deadline, **kwargs)
+        if deadline is None:
+            return future.result()
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            if future.cancel():
+                with self._condition:
+                    expired = self._purge()
+                self._fail_expired(expired)
+                raise DeadlineExceeded(f"Deadline passed in the {self.name} queue", self.retry_after())
+            return future.result()
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run a blocking call through the queue and await its result.
+
+        Cancelling the awaiting task, e.g. when the client disconnects, drops
+        the call if it has not started yet.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stream(
+        self,
+        generator_fn: Callable[..., Iterator],
+        *args,
+        stop_event: Optional[threading.Event] = None,
+        priority: int = PRIORITIES['normal'],
+        deadline: Optional[float] = None,
+        **kwargs
+    ) -> Iterator:
+        """
+        Run a generator as one queued call and return an iterator over its items.
+
+        The call holds a worker until the generator is exhausted. Setting
+        ``stop_event``, which closing the returned iterator also does, ends
+        the generator at its next item, or skips it if it has not started.
+        Admission errors are raised here; a call shed while queued raises
+        DeadlineExceeded from the iterator instead.
+        """
+        stop_event = stop_event or threading.Event()
+        items = queue.Queue()
+
+        def produce():
+            if stop_event.is_set():
+                return
+            for item in generator_fn(*args, **kwargs):
+                items.put((True, item))
+                if stop_event.is_set():
+                    break
+
+        future = self.submit(produce, priority=priority, deadline=deadline)
+        future.add_done_callback(lambda done: items.put((False, done)))
+
+        def consume():
+            try:
+                while True:
+                    is_item, item = items.get()
+                    if not is_item:
+                        item.result()
+                        return
+                    yield item
+            finally:
+                stop_event.set()
+                future.cancel()
+
+        return consume()
+
+    def stats(self) -> Dict:
+        """Return queue depth, wait times, shed counts and the service-time estimate."""
+        with self._condition:
+            names = {value: name for name, value in PRIORITIES.items()}
+            depth = dict.fromkeys(PRIORITIES, 0)
+            for entry in self._heap:
+                depth[names[entry[0]]] += 1
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": len(self._heap),
+                "queue_depth_by_priority": depth,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+                "shed": dict(self.shed),
+                "mean_wait_ms": round(self.wait_seconds / self.started * 1000, 3) if self.started else None,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+                "mean_service_seconds": round(self.mean_service_seconds, 4)
+            }
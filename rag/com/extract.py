@@ -0,0 +1,219 @@
+# rag/com/extract.py
+
+import re
+import json
+import logging
+import unicodedata
+from typing import Dict, IO, Iterator, Optional
+
+import gridfs
+from gridfs.errors import FileExists, NoFile
+
+from rag.com.cache import ByteLRUCache
+from rag.com.db import get_gridfs
+from rag.com.metrics import record_lookup, stage
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ExtractionError(ValueError):
+    """Raised when no text can be extracted from a document."""
+
+
+def normalize_text(text: str) -> str:
+    """Normalize Unicode, line endings and runs of whitespace."""
+    text = unicodedata.normalize('NFC', text).replace('\r\n', '\n').replace('\r', '\n')
+    text = re.sub(r'[^\S\n]+', ' ', text)
+    text = re.sub(r' *\n *', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def _flatten_json(value, path: str = '') -> Iterator[str]:
+    """Yield one 'path: value' line per scalar in a JSON document."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten_json(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for item in value:
+            yield from _flatten_json(item, path)
+    elif value is not None:
+        yield f"{path}: {value}" if path else str(value)
+
+
+def _extract_pdf(stream: IO[bytes]) -> str:
+    try:
+        from pypdf import PdfReader
+        from pypdf.errors import PdfReadError
+    except ImportError as e:
+        raise ImportError("PDF extraction needs pypdf; install requirements.txt") from e
+    try:
+        reader = PdfReader(stream)
+        return "\n\n".join(page.extract_text() or '' for page in reader.pages)
+    except PdfReadError as e:
+        raise ExtractionError(f"Unreadable PDF: {e}") from e
+
+
+def _extract_json(stream: IO[bytes]) -> str:
+    try:
+        return "\n".join(_flatten_json(json.load(stream)))
+    except ValueError as e:
+        raise ExtractionError(f"Invalid JSON: {e}") from e
+
+
+def _extract_plain(stream: IO[bytes]) -> str:
+    try:
+        return stream.read().decode('utf-8-sig')
+    except UnicodeDecodeError as e:
+        raise ExtractionError("Document is not UTF-8 text") from e
+
+
+EXTRACTORS = {
+    'pdf': _extract_pdf,
+    'json': _extract_json
+}
+
+
+def extract_text(stream: IO[bytes], filename: str) -> str:
+    """
+    Extract normalized plain text from a document.
+
+    PDFs are read page by page with pypdf (the stream must be seekable,
+    which GridOut is), JSON documents are flattened to 'key.path: value'
+    lines, and everything else is decoded as UTF-8.
+
+    Raises:
+        ExtractionError: If the document cannot be parsed or decoded
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return normalize_text(EXTRACTORS.get(extension, _extract_plain)(stream))
+
+
+class ExtractedTextStore:
+    """
+    Extracted text of GridFS documents, kept in a second GridFS bucket.
+
+    The text is stored under the same ``_id`` as the original upload, so
+    every reader can fetch it directly. Documents uploaded before the
+    store existed are extracted on first read, once. A failed extraction is
+    recorded too, and retried only once the upload's MD5 or date changes.
+
+    With a ``ByteLRUCache``, decoded text is also kept in process memory,
+    keyed by file id, upload date and source MD5 of the stored text, so a
+    re-extracted document is never served stale from another worker's
+    cache. Only the small file document is fetched to check the version.
+    Extracting again drops the old version from this process's cache; other
+    workers' copies are never looked up again and age out of their LRU.
+    """
+
+    def __init__(self, bucket: str = 'texts', cache: Optional[ByteLRUCache] = None):
+        self.bucket = bucket
+        self.cache = cache
+
+    @property
+    def fs(self) -> gridfs.GridFS:
+        return get_gridfs()
+
+    @property
+    def texts(self) -> gridfs.GridFS:
+        return get_gridfs(self.bucket)
+
+    def extract(self, file_id) -> str:
+        """
+        Extract and store the text of a document, replacing any previous extraction.
+
+        A document without extractable text is stored as an empty file whose
+        metadata records the error, so reads fail without parsing it again
+        until a new upload replaces it.
+
+        Raises:
+            ExtractionError: If the document cannot be parsed or decoded
+        """
+        grid_out = self.fs.get(file_id)
+        source = self._source(grid_out)
+        try:
+            # Includes reading the original from GridFS, which extraction streams
+            with stage('extract'):
+                text = extract_text(grid_out, grid_out.filename)
+        except ExtractionError as e:
+            self._store(file_id, b'', grid_out.filename, dict(source, error=str(e)))
+            raise
+        self._store(file_id, text.encode('utf-8'), grid_out.filename, source)
+        logger.info(f"Extracted {len(text)} characters from {grid_out.filename}")
+        return text
+
+    @staticmethod
+    def _source(grid_out) -> Dict:
+        """The version of an upload an extraction was made from."""
+        return {"md5": (grid_out.metadata or {}).get("md5"), "source_upload_date": grid_out.upload_date}
+
+    def _store(self, file_id, data: bytes, filename: str, metadata: Dict):
+        previous = self.texts.find_one({"_id": file_id})
+        if previous is not None:
+            self.invalidate(previous)
+        self.texts.delete(file_id)
+        try:
+            self.texts.put(data, _id=file_id, filename=filename, metadata=metadata)
+        except FileExists:
+            # Extracted concurrently by another worker
+            pass
+
+    def _failed(self, file_id, grid_out) -> Optional[str]:
+        """Raise the recorded extraction error, unless the upload changed since it was recorded."""
+        metadata = grid_out.metadata or {}
+        source = self.fs.find_one({"_id": file_id})
+        if source is None:
+            return None
+        if self._source(source) == {key: metadata.get(key) for key in ("md5", "source_upload_date")}:
+            raise ExtractionError(metadata["error"])
+        return self.extract(file_id)
+
+    @staticmethod
+    def _cache_key(grid_out):
+        return (grid_out._id, grid_out.upload_date, (grid_out.metadata or {}).get("md5"))
+
+    def invalidate(self, grid_out):
+        """Drop a stored text file's version from this process's cache."""
+        if self.cache is not None:
+            self.cache.pop(self._cache_key(grid_out))
+
+    def get(self, file_id) -> Optional[str]:
+        """
+        Return the extracted text of a document, or None if it does not exist.
+
+        Raises:
+            ExtractionError: If the document holds no extractable text
+        """
+        with stage('gridfs_lookup'):
+            grid_out = self.texts.find_one({"_id": file_id})
+        if grid_out is None:
+            try:
+                return self.extract(file_id)
+            except NoFile:
+                return None
+        if "error" in (grid_out.metadata or {}):
+            return self._failed(file_id, grid_out)
+
+        if self.cache is None:
+            return self._read(grid_out)
+
+        key = self._cache_key(grid_out)
+        text = self.cache.get(key)
+        record_lookup('document', text is not None)
+        if text is None:
+            text = self._read(grid_out)
+            self.cache.put(key, text, grid_out.length)
+        return text
+
+    @staticmethod
+    def _read(grid_out) -> str:
+        with stage('gridfs_read'):
+            data = grid_out.read()
+        with stage('decode'):
+            return data.decode('utf-8')
+
+    def stats(self) -> Dict:
+        """Return the text cache counters."""
+        return self.cache.stats() if self.cache is not None else {}
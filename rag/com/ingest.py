@@ -0,0 +1,151 @@
+# rag/com/ingest.py
+
+import os
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, IO, Optional, Tuple
+
+from bson import ObjectId
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# GridFS default chunk size, so each write fills exactly one chunk document
+UPLOAD_CHUNK_SIZE = 255 * 1024
+
+
+class IngestQueueFull(Exception):
+    """Raised when the ingestion queue has no room for another job."""
+
+
+def store_upload(fs, stream: IO[bytes], filename: str, content_type: Optional[str] = None,
+                 chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[ObjectId, str]:
+    """
+    Copy an upload stream into GridFS chunk by chunk.
+
+    Only one chunk is held in memory at a time. The MD5 of the content is
+    computed on the way through and stored as ``metadata.md5``, since
+    GridFS no longer computes it.
+
+    Returns:
+        The new file id and its MD5 hex digest
+    """
+    md5 = hashlib.md5()
+    with fs.new_file(filename=filename, content_type=content_type) as grid_in:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            md5.update(chunk)
+            grid_in.write(chunk)
+        grid_in.metadata = {"md5": md5.hexdigest()}
+    return grid_in._id, md5.hexdigest()
+
+
+class IngestQueue:
+    """
+    Bounded background queue for document processing.
+
+    Jobs run on a small thread pool in the worker that accepted the upload,
+    and their status and progress are written to a MongoDB collection so
+    any worker can answer status requests. At most ``max_workers`` jobs run
+    and ``max_pending`` wait; beyond that ``submit`` raises IngestQueueFull.
+    Jobs are lost if their worker exits before finishing; their status then
+    stays at the last reported stage.
+    """
+
+    def __init__(self, jobs_collection, process: Callable, max_workers: int = 2, max_pending: int = 32):
+        self.jobs = jobs_collection
+        self.process = process
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._queued = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_executor(self):
+        # Created lazily, and again after fork, since threads do not survive fork
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='ingest')
+                    self._queued = 0
+                    self._pid = os.getpid()
+
+    def has_capacity(self) -> bool:
+        """Whether a job submitted now would be accepted."""
+        self._ensure_executor()
+        with self._lock:
+            return self._queued < self.max_workers + self.max_pending
+
+    def submit(self, file_id: ObjectId, filename: str) -> ObjectId:
+        """Queue a stored document for processing and return the job id."""
+        self._ensure_executor()
+        with self._lock:
+            if self._queued >= self.max_workers + self.max_pending:
+                raise IngestQueueFull(f"Ingestion queue is full ({self.max_workers + self.max_pending} jobs)")
+            self._queued += 1
+
+        try:
+            job_id = ObjectId()
+            now = datetime.utcnow()
+            self.jobs.insert_one({
+                "_id": job_id,
+                "file_id": file_id,
+                "filename": filename,
+                "status": "queued",
+                "stage": "queued",
+                "progress": 0.0,
+                "created_at": now,
+                "updated_at": now,
+                "pid": os.getpid()
+            })
+            self._executor.submit(self._run, job_id, file_id, filename)
+        except Exception:
+            self._release()
+            raise
+        return job_id
+
+    def _release(self):
+        with self._lock:
+            self._queued -= 1
+
+    def _update(self, job_id: ObjectId, **fields):
+        fields["updated_at"] = datetime.utcnow()
+        self.jobs.update_one({"_id": job_id}, {"$set": fields})
+
+    def _run(self, job_id: ObjectId, file_id: ObjectId, filename: str):
+        try:
+            self._update(job_id, status="running", stage="started")
+
+            def progress(stage: str, fraction: float):
+                self._update(job_id, stage=stage, progress=round(fraction, 4))
+
+            result = self.process(file_id, filename, progress)
+            self._update(job_id, status="done", stage="done", progress=1.0, result=result)
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} for {filename} failed: {e}")
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            self._release()
+
+    def get(self, job_id: ObjectId) -> Optional[Dict]:
+        """Return the job document."""
+        return self.jobs.find_one({"_id": job_id})
+
+    def stats(self) -> Dict:
+        """Return pool size, capacity, queued jobs and free slots in this worker."""
+        self._ensure_executor()
+        with self._lock:
+            queued = self._queued
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "queued": queued,
+            "free_slots": self.max_workers + self.max_pending - queued
+        }
@@ -0,0 +1,174 @@
+# rag/com/metrics.py
+"""
+Prometheus metrics for the request pipeline.
+
+Under gunicorn, ``PROMETHEUS_MULTIPROC_DIR`` (set in gunicorn.conf.py) makes
+every worker write its samples to files in that directory, and ``render``
+aggregates the files of all workers, so any worker can answer a scrape.
+Without it, only the current process is reported.
+"""
+
+import os
+import time
+import logging
+from typing import Dict, Iterable, Iterator, List
+
+from flask import Flask, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    'rag_stage_seconds', 'Time spent in one stage of the request pipeline', ['stage'], buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    'rag_http_request_seconds', 'Time until the response starts, by route and status',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+GENERATED_TOKENS = Counter('rag_generated_tokens', 'New tokens produced by model.generate')
+TOKENS_PER_SECOND = Histogram(
+    'rag_generation_tokens_per_second', 'New tokens per second of each model.generate call',
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+)
+CACHE_LOOKUPS = Counter('rag_cache_lookups', 'Cache lookups by cache and result (hit or miss)', ['cache', 'result'])
+MODEL_LOADED = Gauge(
+    'rag_model_loaded', 'Live workers with the model component loaded', ['component'], multiprocess_mode='livesum'
+)
+MODEL_LOAD_SECONDS = Gauge(
+    'rag_model_load_seconds', 'Slowest load of the model component among live workers', ['component'],
+    multiprocess_mode='livemax'
+)
+QUERY_LOG_BUFFERED = Gauge(
+    'rag_query_log_buffered', 'Query log records waiting to be written', multiprocess_mode='livesum'
+)
+QUERY_LOG_FLUSH_SECONDS = Histogram(
+    'rag_query_log_flush_seconds', 'Duration of each insert_many of buffered query logs', buckets=LATENCY_BUCKETS
+)
+QUERY_LOG_DELAY_SECONDS = Histogram(
+    'rag_query_log_delay_seconds', 'Time from answering a query until its record is written', buckets=LATENCY_BUCKETS
+)
+QUERY_LOG_RECORDS = Counter('rag_query_log_records', 'Query log records by outcome (written or dropped)', ['result'])
+
+
+def stage(name: str):
+    """Context manager timing a block as one pipeline stage."""
+    return STAGE_SECONDS.labels(stage=name).time()
+
+
+def timed_iter(name: str, items: Iterable) -> Iterator:
+    """
+    Yield from an iterable, timing only the time spent producing items.
+
+    For lazy sources such as Mongo cursors, where the work happens while
+    iterating; time the consumer spends between items is not counted.
+    """
+    iterator = iter(items)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                return
+            elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        STAGE_SECONDS.labels(stage=name).observe(elapsed)
+
+
+def record_lookup(cache: str, hit: bool):
+    """Count one cache lookup."""
+    CACHE_LOOKUPS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def record_generation(new_tokens: int, seconds: float):
+    """Record the output and throughput of one model.generate call."""
+    GENERATED_TOKENS.inc(new_tokens)
+    if seconds > 0:
+        TOKENS_PER_SECOND.observe(new_tokens / seconds)
+
+
+def instrument_app(app: Flask):
+    """
+    Time every Flask request by route template, method and status.
+
+    Streamed responses are measured until their headers are sent.
+    """
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_SECONDS.labels(
+                method=request.method, route=route, status=str(response.status_code)
+            ).observe(time.perf_counter() - start)
+        return response
+
+
+class _Families:
+    """Registry-like wrapper so generate_latest can render already collected families."""
+
+    def __init__(self, families: List):
+        self.families = families
+
+    def collect(self):
+        return self.families
+
+
+def _hit_ratios(families: List) -> GaugeMetricFamily:
+    """Hit ratio of each cache, from the aggregated lookup counters."""
+    counts = {}
+    for family in families:
+        if family.name != 'rag_cache_lookups':
+            continue
+        for sample in family.samples:
+            if sample.name.endswith('_total'):
+                hits, total = counts.get(sample.labels['cache'], (0.0, 0.0))
+                hit = sample.value if sample.labels['result'] == 'hit' else 0.0
+                counts[sample.labels['cache']] = (hits + hit, total + sample.value)
+    ratios = GaugeMetricFamily('rag_cache_hit_ratio', 'Share of cache lookups that were hits', labels=['cache'])
+    for cache, (hits, total) in sorted(counts.items()):
+        if total:
+            ratios.add_metric([cache], hits / total)
+    return ratios
+
+
+def _registry():
+    """Registry of every worker's samples when multiprocess mode is on, else of this process."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def lookup_counts(cache: str) -> Dict[str, int]:
+    """Hits and misses of one cache, summed over all workers when multiprocess mode is on."""
+    counts = {"hits": 0, "misses": 0}
+    for family in _registry().collect():
+        if family.name != 'rag_cache_lookups':
+            continue
+        for sample in family.samples:
+            if sample.name.endswith('_total') and sample.labels['cache'] == cache:
+                counts["hits" if sample.labels['result'] == 'hit' else "misses"] += int(sample.value)
+    return counts
+
+
+def render() -> bytes:
+    """Render all metrics, of every worker when multiprocess mode is on, in Prometheus text format."""
+    families = list(_registry().collect())
+    families.append(_hit_ratios(families))
+    return generate_latest(_Families(families))
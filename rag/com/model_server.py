@@ -0,0 +1,192 @@
+# rag/com/model_server.py
+
+import os
+import logging
+import threading
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from rag.com.config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# ModelManager methods workers may call through the server
+EXPOSED_METHODS = ('generate', 'analyze_sentiment', 'embed', 'stats', 'load', 'status')
+
+
+class ModelServerError(RuntimeError):
+    """Raised in a worker when the model server reports a failure."""
+
+
+class ModelServer:
+    """
+    Inference process that owns the models on behalf of all HTTP workers.
+
+    Workers connect over a Unix socket and send ``(method, args, kwargs)``
+    tuples. Each connection is served by its own thread, so concurrent
+    ``generate`` calls from different workers meet in the same
+    ``GenerationBatcher`` and are batched together.
+    """
+
+    def __init__(self, address: str, authkey: bytes):
+        # Imported here so workers importing this module for the client do not load models
+        from rag.com.utils_ref import ModelManager
+
+        self.address = address
+        self.authkey = authkey
+        self.manager = ModelManager()
+        if config['preload_models']:
+            self.manager.load()
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        with Listener(self.address, family='AF_UNIX', authkey=self.authkey) as listener:
+            logger.info(f"Model server listening on {self.address}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Rejected model server connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def _handle(self, connection: Connection):
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+
+                if method == 'generate_stream':
+                    if not self._stream(connection, args, kwargs):
+                        return
+                    continue
+
+                try:
+                    if method not in EXPOSED_METHODS:
+                        raise AttributeError(f"Method not exposed: {method}")
+                    connection.send(('ok', getattr(self.manager, method)(*args, **kwargs)))
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    logger.error(f"Error serving {method}: {e}")
+                    connection.send(('error', f"{type(e).__name__}: {e}"))
+
+    def _stream(self, connection: Connection, args, kwargs) -> bool:
+        """Stream tokens to a worker; returns False once the worker has gone away."""
+        stop_event = threading.Event()
+        tokens = self.manager.generate_stream(*args, stop_event=stop_event, **kwargs)
+        try:
+            for text in tokens:
+                connection.send(('token', text))
+            connection.send(('done', None))
+            return True
+        except (EOFError, OSError):
+            # Worker closed the stream, so stop spending inference time on it
+            stop_event.set()
+            return False
+        except Exception as e:
+            logger.error(f"Error streaming generation: {e}")
+            connection.send(('error', f"{type(e).__name__}: {e}"))
+            return True
+        finally:
+            tokens.close()
+
+
+class RemoteModelManager:
+    """
+    Drop-in replacement for ``ModelManager`` that forwards work to the model server.
+
+    Each thread keeps its own connection, reopened after fork, so requests
+    handled concurrently by one worker do not serialize on a single socket.
+    """
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _connect(self) -> Connection:
+        return Client(self.address, family='AF_UNIX', authkey=self.authkey)
+
+    def _connection(self) -> Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = self._connect()
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _call(self, method: str, *args, **kwargs):
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.send((method, args, kwargs))
+                status, payload = connection.recv()
+                break
+            except (EOFError, OSError):
+                # Server restarted or the connection was dropped; reconnect once
+                self._local.connection = None
+                if attempt:
+                    raise
+        if status == 'error':
+            raise ModelServerError(payload)
+        return payload
+
+    def generate(self, prompt: str, **params) -> str:
+        return self._call('generate', prompt, **params)
+
+    def generate_stream(self, prompt: str, stop_event: threading.Event, **params) -> Iterator[str]:
+        # A dedicated connection: closing it is how the server learns the client left
+        connection = self._connect()
+        finished = False
+        try:
+            connection.send(('generate_stream', (prompt,), params))
+            while not stop_event.is_set():
+                status, payload = connection.recv()
+                if status == 'token':
+                    yield payload
+                elif status == 'done':
+                    finished = True
+                    return
+                else:
+                    raise ModelServerError(payload)
+        finally:
+            # Left unset after a complete stream, as ModelManager.generate_stream does
+            if not finished:
+                stop_event.set()
+            connection.close()
+
+    def analyze_sentiment(self, texts: List[str]) -> List[Dict]:
+        return self._call('analyze_sentiment', texts)
+
+    def embed(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        return self._call('embed', texts, batch_size=batch_size)
+
+    def load(self, names: Optional[List[str]] = None) -> Dict[str, Dict]:
+        return self._call('load', names)
+
+    def status(self) -> Dict[str, Dict]:
+        return self._call('status')
+
+    def stats(self) -> Dict:
+        stats = self._call('stats')
+        stats["model_server"] = {"address": self.address}
+        return stats
+
+
+def main():
+    address = config['model_server_socket']
+    Path(address).parent.mkdir(parents=True, exist_ok=True)
+    ModelServer(address, config['model_server_authkey']).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
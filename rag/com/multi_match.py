@@ -0,0 +1,98 @@
+# rag/com/multi_match.py
+
+import re
+from bisect import bisect_right
+from collections import deque
+from typing import Callable, Dict, Iterator, List, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fold_case(text: str) -> str:
+    """Lowercase text without changing its length, so match offsets stay valid."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters (e.g. 'İ') lowercase to two code points; keep those as they are
+    return ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+
+def collapse_whitespace(text: str) -> Tuple[str, Callable[[int], int]]:
+    """
+    Replace every run of whitespace, line breaks included, with one space.
+
+    Returns the collapsed text and a function mapping an offset in it to
+    the offset of the same character in ``text``.
+    """
+    pieces, starts, origins = [], [], []
+    length = position = 0
+    for match in _WHITESPACE.finditer(text):
+        for origin, piece in ((position, text[position:match.start()]), (match.start(), ' ')):
+            pieces.append(piece)
+            starts.append(length)
+            origins.append(origin)
+            length += len(piece)
+        position = match.end()
+    pieces.append(text[position:])
+    starts.append(length)
+    origins.append(position)
+
+    def original(offset: int) -> int:
+        segment = bisect_right(starts, offset) - 1
+        return origins[segment] + offset - starts[segment]
+
+    return ''.join(pieces), original
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton matching many patterns in one pass over a text.
+
+    Matching is case-insensitive and reports every occurrence of every
+    pattern, overlapping ones included, in time linear in the text length
+    plus the number of matches, however many patterns there are.
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = [fold_case(pattern) for pattern in patterns]
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+
+        # Breadth-first, so every failure link points to an already finished state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (start offset, pattern index) for every occurrence in text."""
+        goto, fail, output, patterns = self._goto, self._fail, self._output, self.patterns
+        state = 0
+        for position, char in enumerate(fold_case(text)):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield position - len(patterns[index]) + 1, index
@@ -0,0 +1,137 @@
+# rag/com/prefix_cache.py
+
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import torch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _to_legacy(past) -> Tuple[Tuple[torch.Tensor, torch.Tensor], ...]:
+    """Convert a model's past_key_values to per-layer (key, value) tuples."""
+    if isinstance(past, tuple):
+        return past
+    if hasattr(past, 'to_legacy_cache'):
+        return past.to_legacy_cache()
+    return tuple((layer.keys, layer.values) for layer in past.layers)
+
+
+def _from_legacy(layers, cache_type):
+    """Rebuild past_key_values in the format the model returned for the prefix."""
+    if cache_type is tuple:
+        return layers
+    if hasattr(cache_type, 'from_legacy_cache'):
+        return cache_type.from_legacy_cache(layers)
+    return cache_type(layers)
+
+
+class PrefixKVCache:
+    """
+    Reuses the attention key/value cache of static prompt-template prefixes.
+
+    Every template is split at ``{query}``; the text before it is run
+    through the model once per process and its ``past_key_values`` kept.
+    Prompts that start with a registered prefix are then generated from the
+    cached state, so only the query suffix is prefilled. In a batch the
+    suffixes are left-padded *between* the shared prefix and the query,
+    with the padding masked out, so every row can reuse the same prefix.
+    """
+
+    def __init__(self, model: Callable, tokenizer: Callable):
+        self._model = model
+        self._tokenizer = tokenizer
+        self._prefixes: Dict[str, str] = {}
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.prefill_tokens_saved = 0
+
+    def register(self, name: str, template: str, placeholder: str = '{query}'):
+        """Register the static part of a template that precedes the placeholder."""
+        prefix = template.split(placeholder, 1)[0]
+        # Leave the trailing whitespace to the suffix so BPE merges it with the query's first word
+        prefix = prefix.rstrip()
+        if prefix:
+            self._prefixes[name] = prefix
+
+    def _entry(self, name: str) -> Dict:
+        entry = self._entries.get(name)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is None:
+                    tokenizer = self._tokenizer()
+                    input_ids = tokenizer(self._prefixes[name], return_tensors="pt")["input_ids"]
+                    with torch.no_grad():
+                        past = self._model()(input_ids, use_cache=True).past_key_values
+                    entry = {
+                        "input_ids": input_ids,
+                        "layers": _to_legacy(past),
+                        "cache_type": type(past)
+                    }
+                    self._entries[name] = entry
+                    logger.info(f"Cached {input_ids.shape[1]} prefix tokens for template '{name}'")
+        return entry
+
+    def match(self, prompt: str) -> Optional[str]:
+        """Return the name of the registered prefix the prompt starts with, if any."""
+        for name, prefix in self._prefixes.items():
+            if prompt.startswith(prefix):
+                return name
+        return None
+
+    def prepare(self, prompts: List[str]) -> Optional[Dict]:
+        """
+        Build generate() inputs that reuse a cached prefix.
+
+        Returns None unless every prompt starts with the same registered
+        prefix, in which case callers fall back to plain tokenization.
+        """
+        names = {self.match(prompt) for prompt in prompts}
+        if len(names) != 1 or None in names:
+            self.misses += len(prompts)
+            return None
+
+        name = names.pop()
+        entry = self._entry(name)
+        prefix_ids = entry["input_ids"]
+        prefix_length = prefix_ids.shape[1]
+        batch_size = len(prompts)
+
+        suffixes = [prompt[len(self._prefixes[name]):] for prompt in prompts]
+        suffix = self._tokenizer()(suffixes, return_tensors="pt", padding=True, add_special_tokens=False)
+        input_ids = torch.cat([prefix_ids.expand(batch_size, -1), suffix["input_ids"]], dim=1)
+        attention_mask = torch.cat(
+            [torch.ones(batch_size, prefix_length, dtype=suffix["attention_mask"].dtype), suffix["attention_mask"]],
+            dim=1
+        )
+        # Copies, because generation extends the cache in place
+        layers = tuple(
+            (key.expand(batch_size, -1, -1, -1).contiguous(), value.expand(batch_size, -1, -1, -1).contiguous())
+            for key, value in entry["layers"]
+        )
+
+        self.hits += batch_size
+        self.prefill_tokens_saved += prefix_length * batch_size
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "past_key_values": _from_legacy(layers, entry["cache_type"])
+        }
+
+    def stats(self) -> Dict:
+        """Return prefix sizes, hit counts and prefill tokens saved."""
+        return {
+            "templates": {
+                name: {"prefix_tokens": entry["input_ids"].shape[1]}
+                for name, entry in self._entries.items()
+            },
+            "hits": self.hits,
+            "misses": self.misses,
+            "prefill_tokens_saved": self.prefill_tokens_saved
+        }
@@ -0,0 +1,248 @@
+# rag/com/profiler.py
+"""
+Per-request sampling profiler writing speedscope files.
+
+A request is profiled when it carries the PROFILE_TOKEN in an X-Profile
+header or a ``profile`` query parameter, or, with PROFILE_SAMPLE_RATE > 0,
+when it is picked at random. While it runs, one sampler thread per worker
+records the stack of every thread working on it: the request thread and,
+through ``attached``, the inference executor, generation batcher and
+streaming threads that run its model calls. The result is written to
+PROFILE_DIR as a ``.speedscope.json`` file, which https://www.speedscope.app
+shows as a flame graph, one profile per thread.
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from flask import Flask, g, jsonify, request
+
+from rag.com.config import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_active: ContextVar[Optional['Profile']] = ContextVar('profile', default=None)
+
+
+class Profile:
+    """Stack samples of the threads working on one request."""
+
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.started = time.perf_counter()
+        self.finished = False
+        self._attached: Dict[int, int] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._samples: Dict[int, List[Tuple[Tuple[int, ...], float]]] = {}
+        self._frames: Dict[Tuple[str, str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def attach(self):
+        """Sample the calling thread until the matching ``detach``."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._attached[ident] = self._attached.get(ident, 0) + 1
+            self._thread_names.setdefault(ident, threading.current_thread().name)
+
+    def detach(self):
+        ident = threading.get_ident()
+        with self._lock:
+            if self._attached.get(ident, 0) > 1:
+                self._attached[ident] -= 1
+            else:
+                self._attached.pop(ident, None)
+
+    def _frame_index(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frames.get(key)
+        if index is None:
+            index = self._frames[key] = len(self._frames)
+        return index
+
+    def record(self, frames: Dict[int, object], weight: float):
+        """Add one sample, of ``weight`` seconds, for each attached thread."""
+        with self._lock:
+            for ident in self._attached:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_index(frame.f_code))
+                    frame = frame.f_back
+                if stack:
+                    self._samples.setdefault(ident, []).append((tuple(reversed(stack)), weight))
+
+    def speedscope(self) -> Dict:
+        """Return the samples in speedscope's file format, one sampled profile per thread."""
+        with self._lock:
+            frames = [{"name": name, "file": file, "line": line} for name, file, line in self._frames]
+            profiles = []
+            for ident, samples in self._samples.items():
+                total = sum(weight for _, weight in samples) * 1000
+                profiles.append({
+                    "type": "sampled",
+                    "name": self._thread_names.get(ident, str(ident)),
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(total, 3),
+                    "samples": [list(stack) for stack, _ in samples],
+                    "weights": [round(weight * 1000, 3) for _, weight in samples]
+                })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "rag-api",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles
+        }
+
+
+class Sampler:
+    """
+    One thread per process sampling the stacks of every running Profile.
+
+    It sleeps while nothing is profiled, so profiling costs nothing until
+    a request asks for it. Started lazily, and again after fork.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles = set()
+        self._pid = None
+        self._condition = threading.Condition()
+
+    def add(self, profile: Profile):
+        with self._condition:
+            if self._pid != os.getpid():
+                self._profiles = set()
+                threading.Thread(target=self._run, name='profiler-sampler', daemon=True).start()
+                self._pid = os.getpid()
+            self._profiles.add(profile)
+            self._condition.notify()
+
+    def remove(self, profile: Profile):
+        with self._condition:
+            self._profiles.discard(profile)
+
+    def _run(self):
+        last = time.perf_counter()
+        while True:
+            with self._condition:
+                while not self._profiles:
+                    self._condition.wait()
+                    last = time.perf_counter()
+                profiles = list(self._profiles)
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            for profile in profiles:
+                profile.record(frames, now - last)
+            last = now
+
+
+sampler = Sampler(config['profile_interval_ms'] / 1000)
+
+
+def current() -> Optional[Profile]:
+    """The profile of the request this thread is working on, if any."""
+    profile = _active.get()
+    return profile if profile is not None and not profile.finished else None
+
+
+@contextmanager
+def attached(profile: Optional[Profile]):
+    """Sample the calling thread as part of ``profile`` (captured with ``current``) for the block."""
+    if profile is None:
+        yield
+        return
+    token = _active.set(profile)
+    profile.attach()
+    try:
+        yield
+    finally:
+        profile.detach()
+        _active.reset(token)
+
+
+def start(name: str) -> Profile:
+    """Start profiling the calling thread as a new profile."""
+    profile = Profile(name)
+    _active.set(profile)
+    profile.attach()
+    sampler.add(profile)
+    return profile
+
+
+def finish(profile: Profile) -> Optional[Path]:
+    """Stop a profile and write it to PROFILE_DIR; return the file written."""
+    profile.finished = True
+    sampler.remove(profile)
+    profile.detach()
+    try:
+        directory = Path(config['profile_dir'])
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{profile.id}.speedscope.json"
+        path.write_text(json.dumps(profile.speedscope()))
+        _prune(directory, config['profile_max_files'])
+        return path
+    except OSError as e:
+        logger.error(f"Error writing profile {profile.id}: {e}")
+        return None
+
+
+def _prune(directory: Path, max_files: int):
+    """Delete the oldest profiles beyond max_files."""
+    files = sorted(directory.glob('*.speedscope.json'), key=lambda path: path.stat().st_mtime)
+    for path in files[:max(0, len(files) - max_files)]:
+        path.unlink(missing_ok=True)
+
+
+def instrument_app(app: Flask):
+    """
+    Profile requests that ask for it with the PROFILE_TOKEN, and a random
+    PROFILE_SAMPLE_RATE share of all others.
+
+    A wrong token is answered with 403. Profiled responses carry an
+    X-Profile-Id header naming the file; streamed responses are profiled
+    until the stream ends.
+    """
+    @app.before_request
+    def start_profile():
+        # Clear a profile left in this thread's context by an earlier request
+        _active.set(None)
+        token = request.headers.get('X-Profile') or request.args.get('profile')
+        if token:
+            if not config['profile_token'] or not hmac.compare_digest(token, config['profile_token']):
+                return jsonify({"error": "Invalid profiling token"}), 403
+        elif not config['profile_sample_rate'] or random.random() >= config['profile_sample_rate']:
+            return None
+        g.profile = start(f"{request.method} {request.full_path.rstrip('?')}")
+        return None
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile.id
+            response.call_on_close(lambda: finish(profile))
+        return response
+
+    @app.teardown_request
+    def finish_unanswered(error):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            finish(profile)
@@ -0,0 +1,241 @@
+# rag/com/query_log.py
+
+import os
+import time
+import atexit
+import logging
+import weakref
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from rag.com.metrics import (
+    QUERY_LOG_BUFFERED, QUERY_LOG_DELAY_SECONDS, QUERY_LOG_FLUSH_SECONDS, QUERY_LOG_RECORDS, stage
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Duplicate key: the record was written by an attempt whose reply was lost
+DUPLICATE_KEY = 11000
+
+_writers = weakref.WeakSet()
+
+# A buffered record, when it was added, and the callback to run once it is written
+_Entry = Tuple[Dict, float, Optional[Callable[[Dict], None]]]
+
+
+class QueryLogWriter:
+    """
+    Write-behind buffer for query/response records.
+
+    ``add`` gives the record its ``_id`` and returns at once. A background
+    thread writes buffered records with one unordered ``insert_many`` when
+    ``batch_size`` have accumulated or the oldest has waited ``flush_ms``.
+    While MongoDB is unreachable, records stay buffered and are retried;
+    beyond ``max_buffer`` the oldest are dropped, so a slow database costs
+    log records instead of answers. ``close`` writes what is left, and runs
+    at interpreter exit and from gunicorn's worker_exit hook. An
+    ``on_written`` callback passed to ``add`` runs on the writing thread
+    once the record is stored, and never for a dropped record.
+
+    With ``batch_size`` 1 every record is written synchronously by ``add``.
+    The thread starts lazily, and again after fork.
+    """
+
+    def __init__(
+        self,
+        collection,
+        batch_size: int = 100,
+        flush_ms: float = 500,
+        max_buffer: int = 10000,
+        name: str = 'query-log'
+    ):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self.max_buffer = max_buffer
+        self.name = name
+        self.retry_seconds = max(self.flush_interval, 1.0)
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self._buffer: deque = deque()
+        self._pid = None
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        _writers.add(self)
+
+    def _ensure_running(self):
+        if self._pid != os.getpid():
+            with self._condition:
+                if self._pid != os.getpid():
+                    # Records buffered before fork belong to the parent, which writes them itself
+                    self._buffer = deque()
+                    threading.Thread(target=self._run, name=self.name, daemon=True).start()
+                    self._pid = os.getpid()
+
+    def add(self, record: Dict, on_written: Optional[Callable[[Dict], None]] = None) -> ObjectId:
+        """Queue a record for writing and return its ``_id``; ``on_written`` runs once it is stored."""
+        record.setdefault("_id", ObjectId())
+        if self.batch_size <= 1:
+            with stage('insert_query'):
+                self.collection.insert_one(record)
+            self._count_written(1)
+            self._notify([(record, 0.0, on_written)])
+            return record["_id"]
+
+        self._ensure_running()
+        with self._condition:
+            self._buffer.append((record, time.monotonic(), on_written))
+            self._trim()
+            # Wake the writer to start the flush timer, or to write a full batch
+            if len(self._buffer) == 1 or len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+        return record["_id"]
+
+    def _trim(self):
+        """Drop the oldest records beyond max_buffer; called with the condition held."""
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            for _ in range(overflow):
+                self._buffer.popleft()
+            self.dropped += overflow
+            QUERY_LOG_RECORDS.labels(result='dropped').inc(overflow)
+            logger.warning(f"Query log buffer full, dropped {overflow} oldest records")
+        QUERY_LOG_BUFFERED.set(len(self._buffer))
+
+    def _take(self) -> List[_Entry]:
+        """Remove up to batch_size records from the buffer; called with the condition held."""
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        QUERY_LOG_BUFFERED.set(len(self._buffer))
+        return batch
+
+    def _until_due(self) -> Optional[float]:
+        """Seconds until the buffer should be written: 0 if now, None while it is empty."""
+        if not self._buffer:
+            return None
+        if len(self._buffer) >= self.batch_size:
+            return 0.0
+        return max(0.0, self._buffer[0][1] + self.flush_interval - time.monotonic())
+
+    def _run(self):
+        while True:
+            with self._condition:
+                wait = self._until_due()
+                while wait is None or wait > 0:
+                    self._condition.wait(wait)
+                    wait = self._until_due()
+                batch = self._take()
+            if not self._write(batch):
+                # MongoDB is unavailable; let records accumulate instead of retrying in a tight loop
+                time.sleep(self.retry_seconds)
+
+    def _write(self, batch: List[_Entry]) -> bool:
+        """
+        Insert a batch; return False, with the batch back in the buffer, if it should be retried.
+
+        Records rejected by the server for any reason other than already
+        existing are dropped, since retrying them would fail again.
+        """
+        with self._write_lock:
+            start = time.perf_counter()
+            rejected = set()
+            try:
+                self.collection.insert_many([record for record, _, _ in batch], ordered=False)
+            except BulkWriteError as e:
+                errors = [error for error in e.details.get("writeErrors", []) if error.get("code") != DUPLICATE_KEY]
+                rejected = {error["index"] for error in errors}
+                if errors:
+                    self.dropped += len(errors)
+                    QUERY_LOG_RECORDS.labels(result='dropped').inc(len(errors))
+                    logger.error(f"Query log dropped {len(errors)} rejected records: {errors[0].get('errmsg')}")
+            except PyMongoError as e:
+                self.failed_flushes += 1
+                logger.warning(f"Query log write of {len(batch)} records failed, retrying: {e}")
+                with self._condition:
+                    self._buffer.extendleft(reversed(batch))
+                    self._trim()
+                return False
+            QUERY_LOG_FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+        now = time.monotonic()
+        for _, added, _ in batch:
+            QUERY_LOG_DELAY_SECONDS.observe(now - added)
+        self.flushes += 1
+        self._count_written(len(batch) - len(rejected))
+        self._notify([entry for index, entry in enumerate(batch) if index not in rejected])
+        return True
+
+    def _notify(self, entries: List[_Entry]):
+        """Run the on_written callbacks of stored records."""
+        for record, _, on_written in entries:
+            if on_written is None:
+                continue
+            try:
+                on_written(record)
+            except Exception as e:
+                logger.error(f"Error in query log callback for {record['_id']}: {e}")
+
+    def _count_written(self, count: int):
+        self.written += count
+        QUERY_LOG_RECORDS.labels(result='written').inc(count)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Write every buffered record from the calling thread.
+
+        Returns:
+            False if records are still buffered after ``timeout`` seconds
+            because MongoDB kept failing
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                batch = self._take()
+            if not batch:
+                return True
+            if not self._write(batch):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                time.sleep(self.retry_seconds if remaining is None else min(self.retry_seconds, remaining))
+
+    def close(self, timeout: float = 10.0):
+        """Flush on shutdown, logging the records that could not be written."""
+        if self._pid != os.getpid():
+            return
+        if not self.flush(timeout):
+            with self._condition:
+                lost = len(self._buffer)
+            logger.error(f"Query log lost {lost} records at shutdown: MongoDB unavailable")
+
+    def stats(self) -> Dict:
+        """Return buffer occupancy and write counts."""
+        with self._condition:
+            buffered = len(self._buffer)
+        return {
+            "batch_size": self.batch_size,
+            "flush_ms": self.flush_interval * 1000.0,
+            "max_buffer": self.max_buffer,
+            "buffered": buffered,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "mean_batch_size": self.written / self.flushes if self.flushes else None
+        }
+
+
+def close_all(timeout: float = 10.0):
+    """Flush every writer of this process; for shutdown hooks."""
+    for writer in list(_writers):
+        writer.close(timeout)
+
+
+atexit.register(close_all)
@@ -1,14 +1,30 @@
+import os
+import json
 import logging
 import pdb
-from typing import Dict, Optional
+import time
+import threading
+from typing import Dict, Iterator, Optional, Tuple
 from bson import ObjectId
 
 from flask import request, jsonify, Response
 import gridfs
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import FileWrapper
 
-from rag.com.utils_ref import search, generate_answer, read_document
-from rag.com.config import db, collection
+from rag.com.utils_ref import (
+    search, stream_search, batch_search, list_documents, generate_answer, stream_answer, read_document, get_stats,
+    warmup, model_status, ingest_upload, get_ingest_job, inference_executor, SEARCH_MODES
+)
+from rag.com.config import config
+from rag.com.executor import PRIORITIES, DeadlineExceeded, ExecutorFull
+from rag.com.ingest import IngestQueueFull
+from rag.com.extract import ExtractionError
+from rag.com import startup
+from rag.com.db import get_gridfs
+from rag.com.metrics import CONTENT_TYPE_LATEST, render as render_metrics
 from rag.com.app import app
 
 # Configure logging
@@ -16,11 +32,142 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'md', 'json'}
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+SEARCH_LINE_KEYS = {
+    'query_results': 'query_result',
+    'document_results': 'document_result',
+    'next_cursor': 'next_cursor'
+}
 
 def allowed_file(filename: str) -> bool:
     """Check if file extension is allowed."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def positive_int(value, name: str) -> Optional[int]:
+    """
+    Parse an optional positive integer request argument.
+    
+    Raises:
+        ValueError: If value is given and is not a positive integer
+    """
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a positive integer") from None
+    if number < 1:
+        raise ValueError(f"{name} must be a positive integer")
+    return number
+
+def page_args(
+    limit, cursor, default: Optional[int] = DEFAULT_PAGE_SIZE
+) -> Tuple[Optional[int], Optional[ObjectId]]:
+    """
+    Validate pagination arguments.
+    
+    Raises:
+        ValueError: If limit is not a positive integer or cursor is not an ObjectId
+    """
+    if limit is None:
+        limit = default
+    else:
+        limit = min(positive_int(limit, 'limit'), MAX_PAGE_SIZE)
+    if cursor is not None and not ObjectId.is_valid(cursor):
+        raise ValueError("Invalid cursor")
+    return limit, ObjectId(cursor) if cursor else None
+
+def search_args(data: Dict) -> Dict:
+    """
+    Validate the options of a search request.
+    
+    Checked here, before the search is queued, because a streamed search
+    runs after its response has started and could only fail with a 500.
+    
+    Raises:
+        ValueError: For an invalid mode, top_k or pagination argument
+    """
+    limit, cursor = page_args(data.get('limit'), data.get('cursor'), default=None)
+    mode = data.get('mode', 'semantic')
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(SEARCH_MODES)}")
+    return dict(
+        filename=data.get('filename'),
+        include_sentiment=data.get('include_sentiment', False),
+        top_k=positive_int(data.get('top_k'), 'top_k'),
+        mode=mode,
+        limit=limit,
+        cursor=cursor
+    )
+
+def preferred_mimetype(accept: Optional[str]) -> Optional[str]:
+    """The media type an Accept header ranks highest, by quality, or None if it is missing."""
+    return parse_accept_header(accept, MIMEAccept).best
+
+def wants_ndjson(args, headers) -> bool:
+    """
+    Whether the client asked for newline-delimited JSON, with ?format=ndjson or its Accept header.
+    
+    Takes the query parameters and headers of a Flask or Starlette request.
+    """
+    return (
+        args.get('format') == 'ndjson'
+        or preferred_mimetype(headers.get('Accept')) == 'application/x-ndjson'
+    )
+
+def wants_sse(headers) -> bool:
+    """Whether the client prefers server-sent events, from the headers of a Flask or Starlette request."""
+    return preferred_mimetype(headers.get('Accept')) == 'text/event-stream'
+
+def ndjson_response(lines) -> Response:
+    """Stream an iterable of JSON-serializable objects, one per line."""
+    def generate():
+        for line in lines:
+            yield json.dumps(line) + "\n"
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def admission(headers, data: Dict, endpoint: str) -> Dict:
+    """
+    Priority and deadline of an inference request, as executor keyword arguments.
+    
+    Clients set them with the X-Priority and X-Deadline-Ms headers, or
+    "priority" and "deadline_ms" in the JSON body; otherwise the
+    endpoint's configured defaults apply. A deadline of 0 means none.
+    
+    Raises:
+        ValueError: If the priority is unknown or the deadline is not a non-negative number
+    """
+    priority = headers.get('X-Priority') or data.get('priority') or config[f'{endpoint}_priority']
+    if priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of: {', '.join(PRIORITIES)}")
+    deadline_ms = headers.get('X-Deadline-Ms', data.get('deadline_ms', config[f'{endpoint}_deadline_ms']))
+    try:
+        deadline_ms = float(deadline_ms)
+    except (TypeError, ValueError):
+        raise ValueError("deadline_ms must be a number of milliseconds")
+    if deadline_ms < 0:
+        raise ValueError("deadline_ms must not be negative")
+    return {
+        "priority": PRIORITIES[priority],
+        "deadline": time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+    }
+
+def shed_error(error: ExecutorFull) -> Tuple[Dict, int, Dict]:
+    """Body, status and headers for a request the inference queue turned away."""
+    if isinstance(error, DeadlineExceeded):
+        body, status = {"error": "Deadline exceeded before inference could start"}, 503
+    else:
+        body, status = {"error": "Server is busy, retry later"}, 429
+    return body, status, {"Retry-After": str(error.retry_after)}
+
+def shed_response(error: ExecutorFull) -> Response:
+    """429 when the inference queue is full, 503 when the deadline cannot be met."""
+    body, status, headers = shed_error(error)
+    return jsonify(body), status, headers
+
 @app.route('/api/v1/endpoints', methods=['GET'])
 def list_endpoints_v1():
     """List all available API endpoints."""
@@ -32,58 +179,250 @@ def list_endpoints_v1():
         })
     return jsonify({"endpoints": endpoints})
 
+@app.route('/api/v1/warmup', methods=['POST'])
+def warmup_v1():
+    """Load models ahead of the first request (this worker, or the model server)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        models = warmup(data.get('models'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"models": models, "startup": startup.breakdown()})
+
+@app.route('/api/v1/ready', methods=['GET'])
+def ready_v1():
+    """Readiness: 200 once every model is loaded, 503 otherwise"""
+    models = model_status()
+    ready = all(model["loaded"] for model in models.values())
+    return jsonify({
+        "ready": ready,
+        "models": models,
+        "startup": startup.breakdown()
+    }), 200 if ready else 503
+
+@app.route('/api/v1/stats', methods=['GET'])
+def stats_v1():
+    """Runtime statistics for this worker"""
+    return jsonify({"pid": os.getpid(), "stats": get_stats()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics, aggregated across gunicorn workers"""
+    return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
 @app.route('/api/v1/search', methods=['POST'])
 def search_endpoint_v1():
-    """Search endpoint"""
+    """
+    Search endpoint
+    
+    Stored queries are paged with 'limit' and 'cursor' (the next_cursor of
+    the previous page). With "stream": true, or an Accept header of
+    application/x-ndjson, results are written as NDJSON lines while they
+    are read: {"query_result": ...}, {"document_result": ...} and a final
+    {"next_cursor": ...}.
+    
+    Searches with include_sentiment wait in the inference queue; see admission().
+    """
     data = request.get_json()
     if not data or 'query' not in data:
         return jsonify({"error": "Missing query parameter"}), 400
     
-    results = search(
-        query=data['query'],
-        include_sentiment=data.get('include_sentiment', False)
-    )
+    try:
+        kwargs = search_args(data)
+        admitted = admission(request.headers, data, 'search') if kwargs['include_sentiment'] else None
+        if data.get('stream') or wants_ndjson(request.args, request.headers):
+            if admitted:
+                results = inference_executor.stream(stream_search, data['query'], **admitted, **kwargs)
+            else:
+                results = stream_search(data['query'], **kwargs)
+            return ndjson_response(search_lines(results))
+        if admitted:
+            results = inference_executor.call(search, query=data['query'], **admitted, **kwargs)
+        else:
+            results = search(query=data['query'], **kwargs)
+    except ExecutorFull as e:
+        return shed_response(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"results": results})
 
+def search_lines(results):
+    """NDJSON lines of a streamed search, ending with an error line if it was shed or rejected."""
+    try:
+        for kind, item in results:
+            yield {SEARCH_LINE_KEYS[kind]: item}
+    except (DeadlineExceeded, ValueError) as e:
+        yield {"error": str(e)}
+
+@app.route('/api/v1/search/batch', methods=['POST'])
+def batch_search_endpoint_v1():
+    """Find every occurrence of a list of queries in one pass over the documents"""
+    data = request.get_json()
+    queries = data.get('queries') if data else None
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) for q in queries):
+        return jsonify({"error": "queries must be a non-empty list of strings"}), 400
+    
+    try:
+        results = batch_search(
+            queries,
+            filename=data.get('filename'),
+            max_occurrences=positive_int(data.get('max_occurrences'), 'max_occurrences')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(results)
+
 @app.route('/api/v1/generate', methods=['POST'])
 def generate_endpoint_v1():
-    """Generate endpoint"""
+    """Generate endpoint; generation waits in the inference queue, see admission()"""
     data = request.get_json()
     if not data or 'query' not in data:
         return jsonify({"error": "Missing query parameter"}), 400
     
-    response = generate_answer(data['query'])
+    try:
+        admitted = admission(request.headers, data, 'generate')
+        if data.get('stream'):
+            return stream_generation(data['query'], admitted)
+        response = inference_executor.call(generate_answer, data['query'], **admitted)
+    except ExecutorFull as e:
+        return shed_response(e)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"response": response})
 
+def encode_event(payload: Dict, use_sse: bool) -> str:
+    """Encode one streamed payload as a server-sent event or an NDJSON line."""
+    line = json.dumps(payload)
+    return f"data: {line}\n\n" if use_sse else f"{line}\n"
+
+def stream_events(tokens) -> Iterator[Dict]:
+    """Token, completion and error payloads of a streamed generation."""
+    completion = []
+    try:
+        for text in tokens:
+            completion.append(text)
+            yield {"token": text}
+        yield {"done": True, "completion": "".join(completion)}
+    except DeadlineExceeded as e:
+        yield {"error": str(e)}
+    except Exception as e:
+        logger.error(f"Error streaming response: {e}")
+        yield {"error": "Generation failed"}
+
+def stream_generation(query: str, admitted: Dict) -> Response:
+    """
+    Stream generated tokens as server-sent events or NDJSON.
+    
+    SSE is used when the client accepts text/event-stream, NDJSON otherwise.
+    When the client disconnects the server closes this generator, which
+    stops generation at the next token, or drops it while still queued.
+    
+    Raises:
+        ExecutorFull: If the inference queue turns the request away
+    """
+    use_sse = wants_sse(request.headers)
+    stop_event = threading.Event()
+    tokens = inference_executor.stream(stream_answer, query, stop_event, stop_event=stop_event, **admitted)
+    
+    response = Response(
+        (encode_event(payload, use_sse) for payload in stream_events(tokens)),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Also runs when the client is gone before the first token
+    response.call_on_close(stop_event.set)
+    return response
+
 @app.route('/api/v1/documents', methods=['GET'])
 def list_documents_v1():
-    """List all documents"""
-    fs = gridfs.GridFS(db)
-    files = []
-    for grid_out in fs.find():
-        files.append({
-            'file_id': str(grid_out._id),
-            'filename': grid_out.filename,
-            'upload_date': grid_out.upload_date.strftime('%c')
-        })
-    return jsonify({"files": files})
+    """
+    List documents, oldest first, a page at a time
+    
+    Pass 'limit' and 'cursor' (the next_cursor of the previous page) as query
+    parameters. With format=ndjson, or an Accept header of
+    application/x-ndjson, one file per line is streamed from the Mongo
+    cursor and every document is listed unless 'limit' is given.
+    """
+    ndjson = wants_ndjson(request.args, request.headers)
+    try:
+        limit, cursor = page_args(
+            request.args.get('limit'), request.args.get('cursor'),
+            default=None if ndjson else DEFAULT_PAGE_SIZE
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    files = list_documents(limit, cursor)
+    if ndjson:
+        return ndjson_response(files)
+    
+    files = list(files)
+    next_cursor = files[-1]["file_id"] if len(files) == limit else None
+    return jsonify({"files": files, "next_cursor": next_cursor})
 
 @app.route('/api/v1/documents', methods=['POST'])
 def upload_document_v1():
-    """Upload document endpoint"""
+    """
+    Upload document endpoint
+    
+    The upload is streamed into GridFS and indexed by a background job;
+    poll /api/v1/jobs/<job_id> for progress. Several files may be sent
+    under the same 'file' field.
+    """
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
     
-    file = request.files['file']
-    if file.filename == '':
+    files = [file for file in request.files.getlist('file') if file.filename != '']
+    if not files:
         return jsonify({"error": "No selected file"}), 400
     
-    fs = gridfs.GridFS(db)
-    file_id = fs.put(file.read(), filename=file.filename)
-    return jsonify({
-        "message": "File uploaded successfully",
-        "file_id": str(file_id)
-    }), 201
+    uploads = []
+    for file in files:
+        try:
+            upload = ingest_upload(file.stream, file.filename, file.mimetype)
+        except IngestQueueFull as e:
+            response = jsonify({"error": str(e), "files": uploads})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+        uploads.append({
+            "file_id": str(upload["file_id"]),
+            "filename": file.filename,
+            "md5": upload["md5"],
+            "job_id": str(upload["job_id"]),
+            "status_url": f"/api/v1/jobs/{upload['job_id']}"
+        })
+    
+    result = {"message": "File uploaded successfully", **uploads[0]}
+    if len(uploads) > 1:
+        result = {"message": f"{len(uploads)} files uploaded successfully", "files": uploads}
+    return jsonify(result), 201
+
+@app.route('/api/v1/jobs/<job_id>', methods=['GET'])
+def get_job_v1(job_id):
+    """Status and progress of a background ingestion job"""
+    if not ObjectId.is_valid(job_id):
+        return jsonify({"error": "Invalid job ID format"}), 400
+    
+    job = get_ingest_job(ObjectId(job_id))
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    
+    return jsonify(job_summary(job))
+
+def job_summary(job: Dict) -> Dict:
+    """JSON view of an ingestion job document."""
+    return {
+        "job_id": str(job["_id"]),
+        "file_id": str(job["file_id"]),
+        "filename": job["filename"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat()
+    }
 
 @app.route('/api/v1/documents/<file_id>', methods=['GET'])
 def get_document_v1(file_id):
@@ -92,11 +431,56 @@ def get_document_v1(file_id):
         if not ObjectId.is_valid(file_id):
             return jsonify({"error": "Invalid file ID format"}), 400
         
-        fs = gridfs.GridFS(db)
+        fs = get_gridfs()
         file_obj = fs.get(ObjectId(file_id))
         return jsonify({
-            "content": file_obj.read().decode('utf-8'),
+            "content": read_document(file_obj._id),
             "filename": file_obj.filename
         })
+    except ExtractionError as e:
+        return jsonify({"error": str(e)}), 422
     except Exception as e:
-        return jsonify({"error": "Document not found"}), 404 
\ No newline at end of file
+        return jsonify({"error": "Document not found"}), 404 
+
+def document_etag(grid_out) -> str:
+    """ETag of a stored document: its MD5, or id, length and upload time for files stored without one."""
+    md5 = (grid_out.metadata or {}).get("md5") or grid_out.md5
+    if md5:
+        return md5
+    return f"{grid_out._id}-{grid_out.length}-{int(grid_out.upload_date.timestamp())}"
+
+@app.route('/api/v1/documents/<file_id>/raw', methods=['GET'])
+def download_document_v1(file_id):
+    """
+    Download the original bytes of a document
+    
+    GridFS chunks are streamed to the client rather than read into memory.
+    Supports single byte ranges (206, and 416 when unsatisfiable), If-Range,
+    and If-None-Match against the MD5 ETag (304). Multiple or malformed
+    ranges are answered with the whole document, as RFC 9110 allows.
+    """
+    if not ObjectId.is_valid(file_id):
+        return jsonify({"error": "Invalid file ID format"}), 400
+    
+    fs = get_gridfs()
+    try:
+        grid_out = fs.get(ObjectId(file_id))
+    except gridfs.errors.NoFile:
+        return jsonify({"error": "Document not found"}), 404
+    
+    response = Response(
+        FileWrapper(grid_out, buffer_size=grid_out.chunk_size),
+        mimetype=grid_out.content_type or 'application/octet-stream',
+        direct_passthrough=True
+    )
+    response.content_length = grid_out.length
+    response.last_modified = grid_out.upload_date
+    response.set_etag(document_etag(grid_out))
+    response.headers.set(
+        'Content-Disposition', 'attachment', filename=secure_filename(grid_out.filename or file_id)
+    )
+    # Werkzeug answers these with 416, as it only serves single ranges
+    single_range = 'Range' not in request.headers or (request.range is not None and len(request.range.ranges) == 1)
+    response.accept_ranges = 'bytes'
+    # Sets 304, or 206 and seeks the GridFS stream, as the request headers ask
+    return response.make_conditional(request, accept_ranges=single_range, complete_length=grid_out.length)
@@ -0,0 +1,119 @@
+# rag/com/semantic_cache.py
+
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag.com.vector_index import EmbeddingIndex
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+HISTOGRAM_BUCKETS = 20
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by query-embedding similarity.
+
+    Stored queries are embedded into an ``EmbeddingIndex`` whose rows point
+    back at documents in the ``queries`` collection. A lookup embeds the
+    incoming query, finds its nearest stored query and returns that stored
+    response when the cosine similarity reaches ``threshold``.
+    """
+
+    def __init__(
+        self,
+        index: EmbeddingIndex,
+        queries_collection,
+        embed: Callable[[List[str]], np.ndarray],
+        threshold: float = 0.92
+    ):
+        self.index = index
+        self.queries = queries_collection
+        self.embed = embed
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._similarities = np.zeros(HISTOGRAM_BUCKETS, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def lookup(self, query: str) -> Tuple[Optional[Dict], np.ndarray]:
+        """
+        Find a stored answer for a paraphrase of the query.
+
+        Returns:
+            The matching query document (or None) and the query embedding,
+            which callers reuse when storing a freshly generated answer
+        """
+        vector = self.embed([query])
+        hits = self.index.search(vector, k=1)[0]
+        match = None
+        if hits:
+            row, similarity = hits[0]
+            self._record_similarity(similarity)
+            if similarity >= self.threshold:
+                record = self.index.records(hits)
+                if record:
+                    match = self.queries.find_one({"_id": record[0]["query_id"]}, {"query": 1, "response": 1})
+                    if match is not None:
+                        match["similarity"] = similarity
+
+        with self._lock:
+            if match is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return match, vector
+
+    def add(self, query_id, query: str, vector: Optional[np.ndarray] = None):
+        """Add a stored query to the index, embedding it unless a vector is given."""
+        if vector is None:
+            vector = self.embed([query])
+        self.index.add(np.atleast_2d(vector), [{"query_id": query_id, "query": query}])
+
+    def backfill(self, batch_size: int = 256) -> int:
+        """Embed stored queries that are not in the index yet."""
+        indexed = set(self.index.meta_collection.distinct("query_id"))
+        batch = []
+        total = 0
+        for doc in self.queries.find({}, {"query": 1}):
+            if doc["_id"] in indexed or not doc.get("query"):
+                continue
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                total += self._add_batch(batch)
+                batch = []
+        if batch:
+            total += self._add_batch(batch)
+        return total
+
+    def _add_batch(self, docs: List[Dict]) -> int:
+        vectors = self.embed([doc["query"] for doc in docs])
+        self.index.add(vectors, [{"query_id": doc["_id"], "query": doc["query"]} for doc in docs])
+        return len(docs)
+
+    def _record_similarity(self, similarity: float):
+        bucket = min(max(int(similarity * HISTOGRAM_BUCKETS), 0), HISTOGRAM_BUCKETS - 1)
+        with self._lock:
+            self._similarities[bucket] += 1
+
+    def stats(self) -> Dict:
+        """Return hit rate and the distribution of nearest-neighbour similarities."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "threshold": self.threshold,
+                "entries": len(self.index),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else None,
+                "similarity_histogram": {
+                    f"{i / HISTOGRAM_BUCKETS:.2f}-{(i + 1) / HISTOGRAM_BUCKETS:.2f}": int(count)
+                    for i, count in enumerate(self._similarities)
+                    if count
+                }
+            }
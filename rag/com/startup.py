@@ -0,0 +1,51 @@
+# rag/com/startup.py
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Imported first by rag.com.app so the imports phase covers the heavy dependencies
+PROCESS_START = time.perf_counter()
+
+_phases: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+def record(name: str, seconds: float):
+    """Record the duration of a startup phase."""
+    with _lock:
+        _phases[name] = seconds
+    logger.info(f"Startup phase '{name}' took {seconds:.2f}s")
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block of code as a startup phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def since_start() -> float:
+    """Seconds since the process started importing the application."""
+    return time.perf_counter() - PROCESS_START
+
+
+def breakdown() -> Dict[str, float]:
+    """Return the recorded phase durations in seconds."""
+    with _lock:
+        return {name: round(seconds, 4) for name, seconds in _phases.items()}
+
+
+def log_breakdown():
+    """Log all recorded phases on one line."""
+    phases = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in breakdown().items())
+    logger.info(f"Startup breakdown: {phases}")
@@ -1,14 +1,38 @@
 import os
 import logging
 import warnings
-from typing import Dict, List, Optional, Union
-from functools import lru_cache
+import time
+import threading
+from typing import Any, Callable, Dict, IO, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 
-import gridfs
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import ExecutionTimeout
+import torch
+from transformers import (
+    AutoModel, AutoTokenizer, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+)
 from langchain_core.prompts import PromptTemplate
-from rag.com.config import config, collection, db
+from rag.com import profiler, startup
+from rag.com.backends import BACKENDS, load_causal_lm, load_sentiment_pipeline
+from rag.com.config import config
+from rag.com.db import collection, db, get_gridfs, pool_stats
+from rag.com.vector_index import EmbeddingIndex, chunk_text
+from rag.com.bm25_index import BM25Index, make_snippet
+from rag.com.cache import (
+    LRUCache, ByteLRUCache, text_key, response_cache_key, ResponseCache, MongoResponseCache, DiskResponseCache
+)
+from rag.com.batching import GenerationBatcher
+from rag.com.semantic_cache import SemanticCache
+from rag.com.model_server import RemoteModelManager
+from rag.com.prefix_cache import PrefixKVCache
+from rag.com.ingest import IngestQueue, IngestQueueFull, store_upload
+from rag.com.extract import ExtractedTextStore, ExtractionError
+from rag.com.multi_match import AhoCorasick, collapse_whitespace
+from rag.com.executor import BoundedExecutor
+from rag.com.query_log import QueryLogWriter
+from rag.com.metrics import MODEL_LOADED, MODEL_LOAD_SECONDS, record_generation, record_lookup, stage, timed_iter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,10 +45,33 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 warnings.filterwarnings('ignore', category=UserWarning)
 
+class StopOnEvent(StoppingCriteria):
+    """Stopping criterion that ends generation once an event is set."""
+    
+    def __init__(self, event: threading.Event):
+        self.event = event
+    
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
 class ModelManager:
-    """Singleton class to manage model instances."""
+    """
+    Singleton class to manage model instances.
+    
+    Each model is loaded on first use, so importing the application does
+    not wait for model weights. ``load`` warms models up explicitly and
+    ``status`` reports which ones are in memory.
+    """
     _instance = None
     
+    # Component name -> loader method; tokenizer and generator are split so startup timings show both
+    COMPONENTS = {
+        'tokenizer': '_load_tokenizer',
+        'generator': '_load_generator',
+        'sentiment': '_load_sentiment',
+        'embedding': '_load_embedding'
+    }
+    
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
@@ -32,37 +79,276 @@ class ModelManager:
         return cls._instance
     
     def _initialize_models(self):
-        """Initialize the models lazily."""
+        """Set up lazy model slots; no weights are loaded here."""
+        self._components: Dict[str, object] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._load_locks = {name: threading.Lock() for name in self.COMPONENTS}
+        for name in self.COMPONENTS:
+            MODEL_LOADED.labels(component=name).set(0)
+        self.sentiment_model_name = "distilbert-base-uncased-finetuned-sst-2-english"
+        self.embedding_model_name = config['embedding_model_name']
+        self.backend = config['inference_backend']
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend: {self.backend}")
+        self.sentiment_cache = LRUCache(maxsize=config['sentiment_cache_size'])
+        self.batcher = GenerationBatcher(
+            self._generate_batch,
+            window_ms=config['generation_batch_window_ms'],
+            max_batch_size=config['generation_max_batch_size']
+        )
+        
+        # ONNX Runtime graphs take their own past_key_values layout, so prefix reuse is PyTorch-only
+        self.prefix_cache = None
+        if config['prefix_cache_enabled'] and self.backend != 'onnx':
+            self.prefix_cache = PrefixKVCache(lambda: self.model, lambda: self.tokenizer)
+            for name, prompt in PROMPTS.items():
+                self.prefix_cache.register(name, prompt.template)
+    
+    def _tokenize_prompts(self, prompts: List[str]) -> Dict:
+        """Tokenize prompts for generate(), reusing a cached template prefix when possible."""
+        with stage('tokenize'):
+            inputs = self.prefix_cache.prepare(prompts) if self.prefix_cache is not None else None
+            if inputs is None:
+                inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        return inputs
+    
+    def _timed_generate(self, inputs: Dict, **params):
+        """Run model.generate, recording its latency, new tokens and tokens per second."""
+        start = time.perf_counter()
+        with torch.no_grad(), stage('generate'):
+            outputs = self.model.generate(**inputs, pad_token_id=self.tokenizer.pad_token_id, **params)
+        # Padding after an early end of sequence is not output
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:] != self.tokenizer.pad_token_id
+        record_generation(int(new_tokens.sum()), time.perf_counter() - start)
+        return outputs
+    
+    def _component(self, name: str):
+        """Return a loaded component, loading it on first use."""
+        component = self._components.get(name)
+        if component is None:
+            with self._load_locks[name]:
+                component = self._components.get(name)
+                if component is None:
+                    try:
+                        start = time.perf_counter()
+                        component = getattr(self, self.COMPONENTS[name])()
+                        self._load_seconds[name] = time.perf_counter() - start
+                        startup.record(f"load_{name}", self._load_seconds[name])
+                        MODEL_LOAD_SECONDS.labels(component=name).set(self._load_seconds[name])
+                    except Exception as e:
+                        logger.error(f"Error initializing {name} model: {e}")
+                        raise
+                    self._components[name] = component
+                    MODEL_LOADED.labels(component=name).set(1)
+        return component
+    
+    def _generator_path(self) -> str:
+        """Resolve the local model directory, falling back to the remote model name."""
+        if config['use_local_model']:
+            model_path = Path(config['model_name_local'])
+            if (model_path / "pytorch_model.bin").exists() or (model_path / "model.safetensors").exists():
+                logger.info(f"Loading model from local path: {model_path}")
+                return str(model_path)
+            logger.warning(f"Local model not found at {model_path}, falling back to remote model")
+        remote_model = config['model_name_remote']
+        logger.info(f"Loading model from HuggingFace: {remote_model}")
+        return remote_model
+    
+    def _load_tokenizer(self):
+        tokenizer = AutoTokenizer.from_pretrained(self._generator_path())
+        # Left padding lets prompts of different lengths share one generate call
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+        return tokenizer
+    
+    def _load_generator(self):
+        return load_causal_lm(self._generator_path(), self.backend, Path(config['onnx_generator_dir']))
+    
+    def _load_sentiment(self):
+        # Sentiment analyzer is always loaded from HuggingFace (or its ONNX export)
+        return load_sentiment_pipeline(
+            self.sentiment_model_name, self.backend, Path(config['onnx_sentiment_dir'])
+        )
+    
+    def _load_embedding(self):
+        tokenizer = AutoTokenizer.from_pretrained(self.embedding_model_name)
+        model = AutoModel.from_pretrained(self.embedding_model_name)
+        model.eval()
+        return tokenizer, model
+    
+    @property
+    def tokenizer(self):
+        return self._component('tokenizer')
+    
+    @property
+    def model(self):
+        return self._component('generator')
+    
+    @property
+    def sentiment_analyzer(self):
+        return self._component('sentiment')
+    
+    @property
+    def embedding_tokenizer(self):
+        return self._component('embedding')[0]
+    
+    @property
+    def embedding_model(self):
+        return self._component('embedding')[1]
+    
+    def load(self, names: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Load models ahead of first use.
+        
+        Args:
+            names: Components to load (defaults to all of COMPONENTS)
+            
+        Returns:
+            Model status after loading
+        """
+        for name in names or list(self.COMPONENTS):
+            if name not in self.COMPONENTS:
+                raise ValueError(f"Unknown model component: {name}")
+            self._component(name)
+        return self.status()
+    
+    def status(self) -> Dict[str, Dict]:
+        """Report which models are loaded and how long each took to load."""
+        return {
+            name: {
+                "loaded": name in self._components,
+                "load_seconds": self._load_seconds.get(name),
+                "backend": self.backend if name in ('generator', 'sentiment') else 'eager'
+            }
+            for name in self.COMPONENTS
+        }
+
+    def generate(self, prompt: str, **params) -> str:
+        """Generate a completion for one prompt, batched with concurrent callers."""
+        return self.batcher.submit(prompt, params)
+
+    def generate_stream(self, prompt: str, stop_event: threading.Event, **params) -> Iterator[str]:
+        """
+        Generate a completion for one prompt, yielding text as tokens are produced.
+        
+        Args:
+            prompt: Prompt text
+            stop_event: Set by the caller to stop generation early (e.g. client disconnected)
+            **params: Generation parameters passed to model.generate
+            
+        Yields:
+            Decoded text fragments of the completion, excluding the prompt
+            
+        Raises:
+            Exception: The error that ended generation in the worker thread
+        
+        After a complete stream, ``stop_event`` is set only if the caller set
+        it, so callers can tell a completion cut short from a finished one.
+        """
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        inputs = self._tokenize_prompts([prompt])
+        profile = profiler.current()
+        errors = []
+        
+        def run():
+            try:
+                with profiler.attached(profile):
+                    self._timed_generate(
+                        inputs,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([StopOnEvent(stop_event)]),
+                        **params
+                    )
+            except Exception as e:
+                logger.error(f"Error in streaming generation: {e}")
+                errors.append(e)
+                streamer.end()
+        
+        thread = threading.Thread(target=run, name="generation-stream", daemon=True)
+        thread.start()
+        finished = False
         try:
-            use_local = config['use_local_model']
-            
-            if use_local:
-                # Try loading local model
-                model_path = Path(config['model_name_local'])
-                if not ((model_path / "pytorch_model.bin").exists() or 
-                       (model_path / "model.safetensors").exists()):
-                    logger.warning(f"Local model not found at {model_path}, falling back to remote model")
-                    use_local = False
-                else:
-                    logger.info(f"Loading model from local path: {model_path}")
-                    self.tokenizer = AutoTokenizer.from_pretrained(str(model_path))
-                    self.model = AutoModelForCausalLM.from_pretrained(str(model_path))
-            
-            if not use_local:
-                # Load from HuggingFace
-                remote_model = config['model_name_remote']
-                logger.info(f"Loading model from HuggingFace: {remote_model}")
-                self.tokenizer = AutoTokenizer.from_pretrained(remote_model)
-                self.model = AutoModelForCausalLM.from_pretrained(remote_model)
-            
-            # Initialize sentiment analyzer (always from HuggingFace)
-            self.sentiment_model_name = "distilbert-base-uncased-finetuned-sst-2-english"
-            self.sentiment_analyzer = pipeline("sentiment-analysis", model=self.sentiment_model_name)
-            
-            logger.info("Model initialization completed successfully")
-        except Exception as e:
-            logger.error(f"Error initializing models: {e}")
-            raise
+            for text in streamer:
+                if text:
+                    yield text
+            finished = True
+        finally:
+            if not finished:
+                # The consumer closed the generator early
+                stop_event.set()
+        if errors:
+            raise errors[0]
+
+    def _generate_batch(self, prompts: List[str], params: Dict) -> List[str]:
+        """Run one padded generate call for prompts sharing the same parameters."""
+        inputs = self._tokenize_prompts(prompts)
+        outputs = self._timed_generate(inputs, **params)
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def stats(self) -> Dict:
+        """Return runtime statistics for batching and caches."""
+        return {
+            "generation_batching": self.batcher.stats(),
+            "sentiment_cache": self.sentiment_cache.stats(),
+            "prefix_cache": self.prefix_cache.stats() if self.prefix_cache is not None else None
+        }
+
+    def analyze_sentiment(self, texts: List[str]) -> List[Dict]:
+        """
+        Score texts in padded batches, reusing cached scores for texts seen before.
+        
+        Args:
+            texts: Texts to classify
+            
+        Returns:
+            One {"label", "score"} dictionary per input text, in input order
+        """
+        keys = [text_key(text) for text in texts]
+        results = {key: self.sentiment_cache.get(key) for key in set(keys)}
+        pending = {key: text for key, text in zip(keys, texts) if results[key] is None}
+        for key in results:
+            record_lookup('sentiment', key not in pending)
+        
+        if pending:
+            with stage('sentiment'):
+                scored = self.sentiment_analyzer(
+                    list(pending.values()),
+                    batch_size=config['sentiment_batch_size'],
+                    truncation=True
+                )
+            for key, sentiment in zip(pending, scored):
+                result = {"label": sentiment["label"], "score": sentiment["score"]}
+                self.sentiment_cache.put(key, result)
+                results[key] = result
+        
+        return [results[key] for key in keys]
+
+    def embed(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Embed texts as L2-normalized mean-pooled hidden states."""
+        vectors = []
+        with torch.no_grad(), stage('embed'):
+            for i in range(0, len(texts), batch_size):
+                inputs = self.embedding_tokenizer(
+                    texts[i:i + batch_size],
+                    padding=True,
+                    truncation=True,
+                    max_length=256,
+                    return_tensors="pt"
+                )
+                hidden = self.embedding_model(**inputs).last_hidden_state
+                mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                vectors.append(torch.nn.functional.normalize(pooled, dim=1).numpy())
+        if not vectors:
+            return np.zeros((0, self.embedding_model.config.hidden_size), dtype=np.float32)
+        return np.vstack(vectors).astype(np.float32)
+
+def get_model_manager() -> Union[ModelManager, RemoteModelManager]:
+    """Return the in-process models, or a client for the model server when it is enabled."""
+    if config['model_server_enabled']:
+        return RemoteModelManager(config['model_server_socket'], config['model_server_authkey'])
+    return ModelManager()
 
 # Initialize prompts
 PROMPTS = {
@@ -76,50 +362,294 @@ PROMPTS = {
     )
 }
 
+SEARCH_MODES = ('semantic', 'keyword')
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Create the response cache shared by all workers, as selected by RESPONSE_CACHE_BACKEND."""
+    backend = config['response_cache_backend']
+    ttl = config['response_cache_ttl']
+    max_entries = config['response_cache_max_entries']
+    if backend == 'mongo':
+        return MongoResponseCache(db['response_cache'], ttl, max_entries)
+    if backend == 'disk':
+        return DiskResponseCache(Path(config['response_cache_path']), ttl, max_entries)
+    if backend != 'none':
+        logger.warning(f"Unknown response cache backend '{backend}', caching disabled")
+    return None
+
+# max_new_tokens rather than max_length so left padding in a batch does not eat the token budget
+GENERATION_PARAMS = {
+    'max_new_tokens': config['max_new_tokens'],
+    'num_return_sequences': 1,
+    'do_sample': True,
+    'top_k': 50,
+    'top_p': 0.95,
+    'temperature': 0.7
+}
+
+# Fields of GridFS file documents needed to list them
+DOCUMENT_LIST_PROJECTION = {"filename": 1, "uploadDate": 1, "length": 1}
+
+def document_summary(doc: Dict) -> Dict:
+    """Listing entry for a GridFS file document."""
+    return {
+        "file_id": str(doc["_id"]),
+        "filename": doc.get("filename"),
+        "upload_date": doc["uploadDate"].strftime('%c'),
+        "length": doc["length"]
+    }
+
 class DocumentSearcher:
     """Class to handle document searching and RAG operations."""
     
     def __init__(self):
-        self.fs = gridfs.GridFS(db)
-        self.model_manager = ModelManager()
+        self.texts = ExtractedTextStore(
+            cache=ByteLRUCache(config['document_cache_bytes']) if config['document_cache_bytes'] > 0 else None
+        )
+        self.model_manager = get_model_manager()
+        self.embedding_index = EmbeddingIndex('chunks', Path(config['index_dir']), db['chunks'])
+        self.keyword_index = BM25Index(db['postings'], db['postings_stats'])
+        self.response_cache = create_response_cache()
+        self.semantic_cache = SemanticCache(
+            EmbeddingIndex('queries', Path(config['index_dir']), db['query_vectors']),
+            collection,
+            self.model_manager.embed,
+            threshold=config['semantic_cache_threshold']
+        ) if config['semantic_cache_enabled'] else None
+        self.ingest_queue = IngestQueue(
+            db['ingest_jobs'],
+            self.ingest_document,
+            max_workers=config['ingest_workers'],
+            max_pending=config['ingest_max_pending']
+        )
+        self.query_log = QueryLogWriter(
+            collection,
+            batch_size=config['query_log_batch_size'],
+            flush_ms=config['query_log_flush_ms'],
+            max_buffer=config['query_log_max_buffer']
+        )
+    
+    @property
+    def fs(self):
+        """GridFS bucket of uploaded documents on this process's client."""
+        return get_gridfs()
     
-    @lru_cache(maxsize=128)
     def generate_response(self, query: str) -> str:
-        """Generate a response using the language model."""
+        """
+        Generate a response using the language model.
+        
+        Responses are served from the shared response cache when possible.
+        Because generation samples (do_sample=True), a cached answer is one
+        frozen sample replayed until it expires; with RESPONSE_CACHE_SAMPLED
+        disabled only deterministic generations are cached.
+        """
+        return self._cached_response(query)[0]
+    
+    def _cached_response(self, query: str) -> Tuple[str, bool]:
+        """Like generate_response, also returning whether the model generated it (False for a cache hit)."""
         try:
+            cache = self.response_cache
+            if cache is not None and GENERATION_PARAMS['do_sample'] and not config['response_cache_sampled']:
+                cache = None
+            
+            key = response_cache_key(query, PROMPTS['qa'].template, GENERATION_PARAMS)
+            if cache is not None:
+                cached = cache.get(key)
+                record_lookup('response', cached is not None)
+                if cached is not None:
+                    return cached, False
+            
             prompt_text = PROMPTS['qa'].format(query=query)
-            inputs = self.model_manager.tokenizer(prompt_text, return_tensors="pt")
-            outputs = self.model_manager.model.generate(
-                **inputs,
-                max_length=150,
-                num_return_sequences=1,
-                do_sample=True,
-                top_k=50,
-                top_p=0.95,
-                temperature=0.7
-            )
-            return self.model_manager.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            response = self.model_manager.generate(prompt_text, **GENERATION_PARAMS)
+            if cache is not None:
+                cache.put(key, response)
+            return response, True
         except Exception as e:
             logger.error(f"Error generating response: {e}")
             raise
 
     def handle_query(self, query: str) -> str:
-        """Handle a query and store the response."""
+        """
+        Handle a query and store the response.
+        
+        Paraphrases of stored queries are answered from the semantic cache
+        without running the language model. Only answers the model actually
+        generated are stored, so repeating a query answered from either
+        cache adds no duplicate log records or index vectors.
+        """
         try:
-            response = self.generate_response(query)
-            document = {"query": query, "response": response}
-            collection.insert_one(document)
+            vector = None
+            if self.semantic_cache is not None:
+                match, vector = self.semantic_cache.lookup(query)
+                record_lookup('semantic', match is not None)
+                if match is not None:
+                    logger.info(f"Semantic cache hit ({match['similarity']:.3f}) for query: {query}")
+                    return match["response"]
+            
+            response, generated = self._cached_response(query)
+            if generated:
+                self._store_answer(query, response, vector)
             return response
         except Exception as e:
             logger.error(f"Error handling query: {e}")
             raise
 
+    def index_document(
+        self,
+        file_id,
+        filename: str,
+        content: str,
+        progress: Optional[Callable[[str, float], None]] = None
+    ) -> int:
+        """
+        Chunk a document into the embedding index and the BM25 keyword index.
+        
+        Chunks are embedded and indexed INGEST_EMBED_BATCH at a time, so a
+        large document never holds all of its embeddings at once.
+        
+        Args:
+            file_id: GridFS id of the document
+            filename: Name of the document
+            content: Decoded text of the document
+            progress: Optional callback receiving the stage and fraction done
+            
+        Returns:
+            Number of chunks indexed
+        """
+        try:
+            chunks = chunk_text(content, config['chunk_size'], config['chunk_overlap'])
+            if not chunks:
+                return 0
+            
+            batch_size = config['ingest_embed_batch']
+            for start in range(0, len(chunks), batch_size):
+                batch = chunks[start:start + batch_size]
+                vectors = self.model_manager.embed([chunk["text"] for chunk in batch])
+                records = [
+                    {
+                        "_id": ObjectId(),
+                        "file_id": file_id,
+                        "filename": filename,
+                        "chunk": position,
+                        "text": chunk["text"],
+                        "start": chunk["start"],
+                        "end": chunk["end"]
+                    }
+                    for position, chunk in enumerate(batch, start)
+                ]
+                self.embedding_index.add(vectors, records)
+                self.keyword_index.add_documents((record["_id"], record["text"]) for record in records)
+                if progress is not None:
+                    progress("indexing", (start + len(batch)) / len(chunks))
+            logger.info(f"Indexed {len(chunks)} chunks for file: {filename}")
+            return len(chunks)
+        except Exception as e:
+            logger.error(f"Error indexing document {filename}: {e}")
+            raise
+
+    def ingest_upload(self, stream: IO[bytes], filename: str, content_type: Optional[str] = None) -> Dict:
+        """
+        Stream an upload into GridFS and queue it for background indexing.
+        
+        Raises:
+            IngestQueueFull: When this worker already has too many jobs queued;
+                nothing is stored in that case
+        """
+        if not self.ingest_queue.has_capacity():
+            raise IngestQueueFull("Ingestion queue is full")
+        
+        file_id, md5 = store_upload(self.fs, stream, filename, content_type)
+        try:
+            job_id = self.ingest_queue.submit(file_id, filename)
+        except IngestQueueFull:
+            # Lost the last slot to a concurrent upload
+            self.fs.delete(file_id)
+            raise
+        return {"file_id": file_id, "job_id": job_id, "md5": md5}
+
+    def ingest_document(self, file_id, filename: str, progress: Callable[[str, float], None]) -> Dict:
+        """Background job: extract the text of a stored document and index it, reporting progress."""
+        progress("extracting", 0.0)
+        try:
+            content = self.texts.extract(file_id)
+        except ExtractionError as e:
+            logger.warning(f"No text extracted from {filename}, skipping indexing: {e}")
+            return {"chunks_indexed": 0, "skipped": str(e)}
+        return {"chunks_indexed": self.index_document(file_id, filename, content, progress)}
+
+    def reindex_documents(self) -> int:
+        """Index every GridFS document that has no chunks in the search indexes yet."""
+        chunks = self.embedding_index.meta_collection
+        
+        # Chunks embedded before the keyword index existed only need postings
+        keyword_ids = self.keyword_index.indexed_ids()
+        self.keyword_index.add_documents(
+            (chunk["_id"], chunk["text"])
+            for chunk in chunks.find({}, {"text": 1})
+            if chunk["_id"] not in keyword_ids
+        )
+        
+        indexed_ids = set(chunks.distinct("file_id"))
+        total = 0
+        for grid_out in self.fs.find():
+            if grid_out._id in indexed_ids:
+                continue
+            try:
+                content = self.texts.get(grid_out._id)
+            except ExtractionError as e:
+                logger.warning(f"Skipping {grid_out.filename}: {e}")
+                continue
+            total += self.index_document(grid_out._id, grid_out.filename, content)
+        return total
+
+    def stream_query(self, query: str, stop_event: threading.Event) -> Iterator[str]:
+        """
+        Stream the answer to a query token by token and store it once complete.
+        
+        Answers cut short by closing the generator or setting ``stop_event``,
+        and answers whose generation failed, are not stored.
+        """
+        prompt_text = PROMPTS['qa'].format(query=query)
+        completion = []
+        for text in self.model_manager.generate_stream(prompt_text, stop_event, **GENERATION_PARAMS):
+            completion.append(text)
+            yield text
+        if stop_event.is_set():
+            return
+        
+        response = prompt_text + "".join(completion)
+        self._store_answer(query, response)
+
+    def _store_answer(self, query: str, response: str, vector: Optional[np.ndarray] = None):
+        """
+        Log a query/response pair and make it available to the semantic cache.
+        
+        The record is written behind the response by the query log, so it
+        reaches query-history search and semantic cache hits within
+        QUERY_LOG_FLUSH_MS. The query is added to the semantic cache only
+        once the record is stored, so a record the log drops is never a
+        cache hit pointing at nothing. It is embedded here, not on the
+        query log's writer thread.
+        """
+        if self.semantic_cache is None:
+            self.query_log.add({"query": query, "response": response})
+            return
+        if vector is None:
+            vector = self.semantic_cache.embed([query])
+        self.query_log.add(
+            {"query": query, "response": response},
+            on_written=lambda record: self.semantic_cache.add(record["_id"], query, vector)
+        )
+
     def search_documents(
         self,
         query: str,
         filename: Optional[str] = None,
         include_sentiment: bool = False,
-        context_length: int = 100
+        top_k: Optional[int] = None,
+        mode: str = 'semantic',
+        limit: Optional[int] = None,
+        cursor: Optional[ObjectId] = None
     ) -> Dict[str, List[Dict]]:
         """
         Unified search function that handles both collection and GridFS searches.
@@ -128,64 +658,266 @@ class DocumentSearcher:
             query: Search query string
             filename: Optional specific filename to search
             include_sentiment: Whether to include sentiment analysis
-            context_length: Length of the context window around found query
+            top_k: Number of ranked chunks to return (defaults to SEARCH_TOP_K)
+            mode: 'semantic' for embedding similarity or 'keyword' for BM25 ranking
+            limit: Maximum stored queries to return (defaults to QUERY_RESULTS_LIMIT)
+            cursor: Return stored queries after this id (the previous page's next_cursor)
             
         Returns:
-            Dictionary containing query results and document results
+            Dictionary containing query results, document results and the
+            cursor of the next page of query results (None on the last page)
         """
+        results = {
+            "query_results": [],
+            "document_results": [],
+            "next_cursor": None
+        }
+        for kind, item in self.stream_search(query, filename, include_sentiment, top_k, mode, limit, cursor):
+            if kind == "next_cursor":
+                results["next_cursor"] = item
+            else:
+                results[kind].append(item)
+        return results
+
+    def stream_search(
+        self,
+        query: str,
+        filename: Optional[str] = None,
+        include_sentiment: bool = False,
+        top_k: Optional[int] = None,
+        mode: str = 'semantic',
+        limit: Optional[int] = None,
+        cursor: Optional[ObjectId] = None
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Search like search_documents, yielding ('query_results', item),
+        ('document_results', item) and finally ('next_cursor', id) pairs.
+        
+        Stored queries are yielded while the Mongo cursor is iterated, so
+        callers can write them out without holding the whole result set.
+        
+        Raises:
+            ValueError: For an unknown mode, before anything is yielded
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        return self._stream_search(query, filename, include_sentiment, top_k, mode, limit, cursor)
+
+    def _stream_search(
+        self, query, filename, include_sentiment, top_k, mode, limit, cursor
+    ) -> Iterator[Tuple[str, Any]]:
         try:
             logger.info(f"Searching for query: {query}" + (f" in file: {filename}" if filename else ""))
             
-            results = {
-                "query_results": [],
-                "document_results": []
-            }
-            
             # Search in collection
+            limit = limit or config['query_results_limit']
+            last_id = None
+            returned = 0
             if not filename:
-                search_results = collection.find({"$text": {"$search": query}})
-                results["query_results"] = [
-                    {"query": doc["query"], "response": doc["response"]}
-                    for doc in search_results
-                ]
+                for doc in self.iter_query_results(query, limit, cursor):
+                    last_id = doc["id"]
+                    returned += 1
+                    yield "query_results", doc
             
-            # Search in GridFS documents
-            grid_query = {"filename": filename} if filename else {}
-            for grid_out in self.fs.find(grid_query):
-                content = grid_out.read().decode('utf-8')
-                start_index = content.lower().find(query.lower())
-                
-                if start_index != -1:
-                    end_index = start_index + len(query) + context_length
-                    snippet = content[start_index:end_index]
-                    
-                    doc_result = {
-                        "filename": grid_out.filename,
-                        "snippet": snippet
-                    }
-                    
-                    # Add sentiment analysis if requested
-                    if include_sentiment:
-                        sentiment = self.model_manager.sentiment_analyzer(snippet)
-                        doc_result["sentiment"] = {
-                            "label": sentiment[0]["label"],
-                            "score": sentiment[0]["score"]
-                        }
-                    
-                    results["document_results"].append(doc_result)
-            
-            logger.info(f"Found {len(results['document_results'])} document results")
-            return results
+            top_k = top_k or config['search_top_k']
+            if mode == 'keyword':
+                chunks = self._keyword_chunks(query, filename, top_k)
+            else:
+                chunks = self._semantic_chunks(query, filename, top_k)
+            
+            document_results = [
+                {
+                    "file_id": str(chunk["file_id"]),
+                    "filename": chunk["filename"],
+                    "snippet": chunk["snippet"],
+                    "score": chunk["score"]
+                }
+                for chunk in chunks
+            ]
+            
+            # Add sentiment analysis if requested, scoring all snippets together
+            if include_sentiment and document_results:
+                sentiments = self.model_manager.analyze_sentiment(
+                    [doc_result["snippet"] for doc_result in document_results]
+                )
+                for doc_result, sentiment in zip(document_results, sentiments):
+                    doc_result["sentiment"] = sentiment
+            
+            for doc_result in document_results:
+                yield "document_results", doc_result
+            
+            logger.info(f"Found {len(document_results)} document results")
+            yield "next_cursor", last_id if returned == limit else None
             
         except Exception as e:
             logger.error(f"Error in document search: {e}")
             raise
 
-    def read_file(self, file_id: str) -> Optional[str]:
-        """Read a specific file from GridFS."""
+    def batch_search(
+        self,
+        queries: List[str],
+        filename: Optional[str] = None,
+        max_occurrences: Optional[int] = None
+    ) -> Dict:
+        """
+        Find every occurrence of many queries in one pass over the corpus.
+        
+        All queries are matched together by an Aho-Corasick automaton, so
+        each document's extracted text is read and scanned once per batch
+        rather than once per query. Matching is case-insensitive, and any
+        run of whitespace in a query matches any run in the text, line
+        breaks included. Offsets and snippets refer to the extracted text.
+        
+        Args:
+            queries: Phrases to find
+            filename: Optional specific filename to scan
+            max_occurrences: Occurrences returned per query (defaults to
+                BATCH_SEARCH_MAX_OCCURRENCES); 'total' still counts all of them
+            
+        Returns:
+            Dictionary with one result per query and the number of documents scanned
+        """
+        if len(queries) > config['batch_search_max_queries']:
+            raise ValueError(f"At most {config['batch_search_max_queries']} queries per batch")
+        max_occurrences = max_occurrences or config['batch_search_max_occurrences']
+        
+        # Duplicate queries share one pattern
+        patterns = list(dict.fromkeys(" ".join(query.split()) for query in queries))
+        if not all(patterns):
+            raise ValueError("Queries must not be empty")
+        automaton = AhoCorasick(patterns)
+        found = {pattern: {"total": 0, "occurrences": []} for pattern in patterns}
+        
+        try:
+            scanned = 0
+            spec = {"filename": filename} if filename else {}
+            for doc in db['fs.files'].find(spec, {"filename": 1}).sort("_id", 1):
+                try:
+                    text = self.texts.get(doc["_id"])
+                except ExtractionError:
+                    continue
+                if not text:
+                    continue
+                scanned += 1
+                # Whitespace is collapsed as in the patterns, keeping offsets into the text
+                collapsed, original = collapse_whitespace(text)
+                for collapsed_start, index in automaton.finditer(collapsed):
+                    result = found[patterns[index]]
+                    result["total"] += 1
+                    if len(result["occurrences"]) < max_occurrences:
+                        start = original(collapsed_start)
+                        end = original(collapsed_start + len(patterns[index]) - 1) + 1
+                        result["occurrences"].append({
+                            "file_id": str(doc["_id"]),
+                            "filename": doc.get("filename"),
+                            "start": start,
+                            "end": end,
+                            "snippet": text[max(0, start - 60):end + 60]
+                        })
+            
+            logger.info(f"Batch search of {len(patterns)} patterns scanned {scanned} documents")
+            return {
+                "results": [
+                    {"query": query, **found[" ".join(query.split())]} for query in queries
+                ],
+                "documents_scanned": scanned
+            }
+        except Exception as e:
+            logger.error(f"Error in batch search: {e}")
+            raise
+
+    def iter_query_results(self, query: str, limit: int, cursor: Optional[ObjectId] = None) -> Iterator[Dict]:
+        """
+        Yield the stored queries best matching a text search, highest textScore first.
+        
+        Only the query, response and score of at most ``limit`` matches are
+        returned; the server keeps just the top ``limit`` while ranking. The
+        search runs for at most QUERY_RESULTS_MAX_TIME_MS, after which it
+        yields nothing rather than failing the whole search.
+        
+        Args:
+            query: Text searched in the stored queries and responses
+            limit: Maximum results
+            cursor: Id of the last result of the previous page; the ranking
+                continues after it
+            
+        Raises:
+            ValueError: If the cursor is not a result of this search
+        """
+        match = {"$match": {"$text": {"$search": query}}}
+        project = {"$project": {"query": 1, "response": 1, "score": {"$meta": "textScore"}}}
+        options = {"maxTimeMS": config['query_results_max_time_ms']} if config['query_results_max_time_ms'] else {}
+        pipeline = [match, project]
         try:
-            grid_out = self.fs.get(file_id)
-            return grid_out.read().decode('utf-8') if grid_out else None
+            if cursor is not None:
+                previous = next(collection.aggregate(
+                    [{"$match": {**match["$match"], "_id": cursor}}, project], **options
+                ), None)
+                if previous is None:
+                    raise ValueError("Invalid cursor")
+                # Keyset on (score, _id), so pages neither skip nor repeat tied scores
+                pipeline.append({"$match": {"$or": [
+                    {"score": {"$lt": previous["score"]}},
+                    {"score": previous["score"], "_id": {"$gt": cursor}}
+                ]}})
+            pipeline += [{"$sort": {"score": -1, "_id": 1}}, {"$limit": limit}]
+            for doc in timed_iter('text_query', collection.aggregate(pipeline, **options)):
+                yield {"id": str(doc["_id"]), "query": doc["query"], "response": doc["response"], "score": doc["score"]}
+        except ExecutionTimeout:
+            logger.warning(f"Query history search exceeded {config['query_results_max_time_ms']}ms: {query}")
+
+    def iter_documents(self, limit: Optional[int] = None, cursor: Optional[ObjectId] = None) -> Iterator[Dict]:
+        """
+        Yield the metadata of stored documents in _id order, after cursor.
+        
+        Only the listed fields of the GridFS file documents are fetched.
+        """
+        spec = {"_id": {"$gt": cursor}} if cursor is not None else {}
+        files = db['fs.files'].find(spec, DOCUMENT_LIST_PROJECTION).sort("_id", 1)
+        if limit:
+            files = files.limit(limit)
+        for doc in files:
+            yield document_summary(doc)
+
+    def _semantic_chunks(self, query: str, filename: Optional[str], top_k: int) -> List[Dict]:
+        """Rank indexed chunks by cosine similarity to the query embedding."""
+        rows = self.embedding_index.rows_for({"filename": filename}) if filename else None
+        query_vector = self.model_manager.embed([query])
+        with stage('vector_search'):
+            hits = self.embedding_index.search(query_vector, k=top_k, rows=rows)[0]
+            chunks = self.embedding_index.records(hits)
+        for chunk in chunks:
+            chunk["snippet"] = chunk["text"]
+        return chunks
+
+    def _keyword_chunks(self, query: str, filename: Optional[str], top_k: int) -> List[Dict]:
+        """Rank indexed chunks with BM25 over the postings of the query terms."""
+        chunks_collection = self.embedding_index.meta_collection
+        with stage('keyword_search'):
+            doc_ids = chunks_collection.distinct("_id", {"filename": filename}) if filename else None
+            hits = self.keyword_index.search(query, k=top_k, doc_ids=doc_ids)
+            scores = dict(hits)
+            chunks = sorted(
+                chunks_collection.find({"_id": {"$in": list(scores)}}),
+                key=lambda chunk: scores[chunk["_id"]],
+                reverse=True
+            )
+        for chunk in chunks:
+            chunk["score"] = scores[chunk["_id"]]
+            chunk["snippet"] = make_snippet(chunk["text"], query)
+        return chunks
+
+    def read_file(self, file_id: ObjectId) -> Optional[str]:
+        """
+        Read the extracted text of a file.
+        
+        Raises:
+            ExtractionError: If the file holds no extractable text
+        """
+        try:
+            return self.texts.get(file_id)
+        except ExtractionError:
+            raise
         except Exception as e:
             logger.error(f"Error reading file {file_id}: {e}")
             return None
@@ -193,15 +925,69 @@ class DocumentSearcher:
 # Create a singleton instance
 document_searcher = DocumentSearcher()
 
+# Admission queue for generation and sentiment inference, shared by the Flask and ASGI routes
+inference_executor = BoundedExecutor(config['inference_workers'], config['inference_queue_size'])
+
 # Export the main functions with simpler interfaces
 def search(query: str, **kwargs) -> Dict:
     """Main search interface."""
     return document_searcher.search_documents(query, **kwargs)
 
+def stream_search(query: str, **kwargs) -> Iterator[Tuple[str, Any]]:
+    """Main streaming search interface."""
+    return document_searcher.stream_search(query, **kwargs)
+
+def batch_search(queries: List[str], **kwargs) -> Dict:
+    """Main multi-query search interface."""
+    return document_searcher.batch_search(queries, **kwargs)
+
+def list_documents(limit: Optional[int] = None, cursor: Optional[ObjectId] = None) -> Iterator[Dict]:
+    """Main document listing interface."""
+    return document_searcher.iter_documents(limit, cursor)
+
 def generate_answer(query: str) -> str:
     """Main generation interface."""
     return document_searcher.handle_query(query)
 
-def read_document(file_id: str) -> Optional[str]:
+def index_document(file_id, filename: str, content: str) -> int:
+    """Main document indexing interface."""
+    return document_searcher.index_document(file_id, filename, content)
+
+def ingest_upload(stream: IO[bytes], filename: str, content_type: Optional[str] = None) -> Dict:
+    """Main document upload interface."""
+    return document_searcher.ingest_upload(stream, filename, content_type)
+
+def get_ingest_job(job_id: ObjectId) -> Optional[Dict]:
+    """Main ingestion job status interface."""
+    return document_searcher.ingest_queue.get(job_id)
+
+def stream_answer(query: str, stop_event: threading.Event) -> Iterator[str]:
+    """Main streaming generation interface."""
+    return document_searcher.stream_query(query, stop_event)
+
+def read_document(file_id: ObjectId) -> Optional[str]:
     """Main document reading interface."""
-    return document_searcher.read_file(file_id) 
\ No newline at end of file
+    return document_searcher.read_file(file_id)
+
+def warmup(names: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Main model warmup interface."""
+    return document_searcher.model_manager.load(names)
+
+def model_status() -> Dict[str, Dict]:
+    """Main model readiness interface."""
+    return document_searcher.model_manager.status()
+
+def get_stats() -> Dict:
+    """Main runtime statistics interface."""
+    stats = document_searcher.model_manager.stats()
+    if document_searcher.response_cache is not None:
+        stats["response_cache"] = document_searcher.response_cache.stats()
+    if document_searcher.semantic_cache is not None:
+        stats["semantic_cache"] = document_searcher.semantic_cache.stats()
+    stats["ingest_queue"] = document_searcher.ingest_queue.stats()
+    if document_searcher.texts.cache is not None:
+        stats["document_cache"] = document_searcher.texts.stats()
+    stats["mongo_pool"] = pool_stats()
+    stats["inference_executor"] = inference_executor.stats()
+    stats["query_log"] = document_searcher.query_log.stats()
+    return stats 
\ No newline at end of file
@@ -0,0 +1,231 @@
+# rag/com/vector_index.py
+
+import os
+import json
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DTYPE = np.dtype('<f4')
+
+
+def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> List[Dict]:
+    """
+    Split text into overlapping character windows.
+
+    Window ends are moved back to the nearest whitespace when one is available
+    so that words are not cut in half.
+
+    Args:
+        text: Text to split
+        chunk_size: Maximum number of characters per chunk
+        overlap: Number of characters shared by consecutive chunks
+
+    Returns:
+        List of dictionaries with the chunk text and its start/end offsets
+    """
+    if overlap >= chunk_size:
+        raise ValueError("overlap must be smaller than chunk_size")
+
+    chunks = []
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            boundary = text.rfind(' ', start + overlap + 1, end)
+            if boundary != -1:
+                end = boundary
+        piece = text[start:end].strip()
+        if piece:
+            chunks.append({"text": piece, "start": start, "end": end})
+        if end >= length:
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+class EmbeddingIndex:
+    """
+    Append-only matrix of L2-normalized embeddings persisted on disk.
+
+    Vectors are stored row-major as raw float32 in ``<name>.f32`` and opened
+    with ``np.memmap`` so every worker process maps the same page-cache copy.
+    Row metadata (file, chunk text, offsets) lives in a MongoDB collection
+    keyed by ``row``. Writers serialize on an ``flock`` so rows stay aligned
+    across processes; readers pick up new rows when the file grows.
+    """
+
+    def __init__(self, name: str, index_dir: Path, meta_collection):
+        self.name = name
+        self.index_dir = Path(index_dir)
+        self.meta_collection = meta_collection
+        self.data_path = self.index_dir / f"{name}.f32"
+        self.header_path = self.index_dir / f"{name}.json"
+        self.lock_path = self.index_dir / f"{name}.lock"
+        self._dim: Optional[int] = None
+        self._matrix: Optional[np.memmap] = None
+        self._mapped_size = -1
+        self._open_lock = threading.Lock()
+        self._indexes_ready = False
+
+    @property
+    def dim(self) -> Optional[int]:
+        """Embedding dimension, read from the header once the index has data."""
+        if self._dim is None and self.header_path.exists():
+            self._dim = json.loads(self.header_path.read_text())['dim']
+        return self._dim
+
+    def __len__(self) -> int:
+        dim = self.dim
+        if dim is None or not self.data_path.exists():
+            return 0
+        return os.path.getsize(self.data_path) // (dim * DTYPE.itemsize)
+
+    @contextmanager
+    def _write_lock(self):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _ensure_indexes(self):
+        if not self._indexes_ready:
+            self.meta_collection.create_index('row', unique=True)
+            self.meta_collection.create_index('file_id')
+            self._indexes_ready = True
+
+    def matrix(self) -> Optional[np.ndarray]:
+        """Return the memory-mapped matrix, remapping it if other processes appended rows."""
+        dim = self.dim
+        if dim is None or not self.data_path.exists():
+            return None
+        size = os.path.getsize(self.data_path)
+        if size != self._mapped_size:
+            with self._open_lock:
+                if size != self._mapped_size:
+                    rows = size // (dim * DTYPE.itemsize)
+                    self._matrix = (
+                        np.memmap(self.data_path, dtype=DTYPE, mode='r', shape=(rows, dim))
+                        if rows else None
+                    )
+                    self._mapped_size = size
+        return self._matrix
+
+    def add(self, vectors: np.ndarray, records: List[Dict]) -> List[int]:
+        """
+        Append vectors and their metadata records.
+
+        Args:
+            vectors: Array of shape (n, dim)
+            records: One metadata dictionary per vector
+
+        Returns:
+            Row numbers assigned to the new vectors
+        """
+        if len(vectors) != len(records):
+            raise ValueError("vectors and records must have the same length")
+        if not len(vectors):
+            return []
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = (vectors / np.maximum(norms, 1e-12)).astype(DTYPE)
+
+        self._ensure_indexes()
+        with self._write_lock():
+            if self.dim is None:
+                self.header_path.write_text(json.dumps({"dim": int(vectors.shape[1]), "dtype": DTYPE.str}))
+                self._dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            start_row = len(self)
+            with open(self.data_path, 'ab') as data_file:
+                data_file.write(vectors.tobytes())
+                data_file.flush()
+                os.fsync(data_file.fileno())
+
+            rows = list(range(start_row, start_row + len(vectors)))
+            self.meta_collection.insert_many([
+                dict(record, row=row) for row, record in zip(rows, records)
+            ])
+        return rows
+
+    def rows_for(self, query: Dict) -> np.ndarray:
+        """Return the row numbers whose metadata matches a MongoDB filter."""
+        return np.fromiter(
+            (doc['row'] for doc in self.meta_collection.find(query, {"row": 1})),
+            dtype=np.int64
+        )
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        rows: Optional[np.ndarray] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Batched cosine top-k over the index.
+
+        Args:
+            queries: Array of shape (m, dim); rows are normalized here
+            k: Number of hits per query
+            rows: Optional subset of rows to restrict the search to
+
+        Returns:
+            For each query, a list of (row, score) pairs ordered by score
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        matrix = self.matrix()
+        if matrix is None or k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        if rows is not None:
+            rows = rows[rows < len(matrix)]
+            candidates = matrix[rows]
+        else:
+            candidates = matrix
+        if not len(candidates):
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ candidates.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for i, columns in enumerate(top):
+            columns = columns[np.argsort(-scores[i, columns])]
+            ids = rows[columns] if rows is not None else columns
+            results.append([(int(row), float(scores[i, col])) for row, col in zip(ids, columns)])
+        return results
+
+    def records(self, hits: List[Tuple[int, float]], projection: Optional[Dict] = None) -> List[Dict]:
+        """Fetch metadata for search hits, preserving rank order and attaching scores."""
+        if not hits:
+            return []
+        if projection is not None:
+            projection = dict(projection, row=1)
+        by_row = {
+            doc['row']: doc
+            for doc in self.meta_collection.find({"row": {"$in": [row for row, _ in hits]}}, projection)
+        }
+        results = []
+        for row, score in hits:
+            doc = by_row.get(row)
+            if doc is not None:
+                doc['score'] = score
+                results.append(doc)
+        return results
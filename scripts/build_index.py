@@ -0,0 +1,38 @@
+import logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def build_index():
+    """
+    Chunk and embed GridFS documents that are not in the embedding index yet,
+    and embed stored queries missing from the semantic cache.
+    
+    Documents uploaded through the API are indexed on upload; this backfills
+    documents stored before the index existed or written directly to GridFS.
+    """
+    try:
+        from rag.com.utils_ref import document_searcher
+        
+        logger.info("Indexing documents missing from the embedding index...")
+        total = document_searcher.reindex_documents()
+        logger.info(f"Indexed {total} chunks")
+        
+        if document_searcher.semantic_cache is not None:
+            logger.info("Embedding stored queries for the semantic cache...")
+            total = document_searcher.semantic_cache.backfill()
+            logger.info(f"Embedded {total} queries")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error building index: {str(e)}")
+        return False
+
+if __name__ == "__main__":
+    success = build_index()
+    if not success:
+        exit(1)
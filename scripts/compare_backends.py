@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+
+import torch
+from transformers import AutoTokenizer
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SAMPLE_QUERIES = [
+    "How do I create a user?",
+    "What is the difference between unit and integration tests?",
+    "How can I make flaky UI tests more reliable?",
+    "Which metrics show that test automation is paying off?"
+]
+
+SAMPLE_SNIPPETS = [
+    "The new release fixed every regression we reported and the suite runs twice as fast.",
+    "Deployments keep failing because the staging database is never reset between runs.",
+    "The API returns a user object with an id, a name and an optional email address.",
+    "Nobody could reproduce the crash, and the logs were useless."
+]
+
+
+def _greedy_generate(model, tokenizer, prompts, max_new_tokens):
+    outputs = []
+    start = time.perf_counter()
+    with torch.no_grad():
+        for prompt in prompts:
+            inputs = tokenizer(prompt, return_tensors="pt")
+            generated = model.generate(
+                **inputs,
+                max_new_tokens=max_new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.pad_token_id
+            )
+            outputs.append(generated[0, inputs["input_ids"].shape[1]:].tolist())
+    return outputs, time.perf_counter() - start
+
+
+def _token_agreement(reference, candidate):
+    """Fraction of positions where candidate tokens equal the reference tokens."""
+    length = max(len(reference), len(candidate), 1)
+    return sum(a == b for a, b in zip(reference, candidate)) / length
+
+
+def compare_backends(backends, max_new_tokens=32, output_path=None):
+    """
+    Run the same prompts and snippets through each backend and report parity and throughput.
+
+    The first backend is the reference (normally eager). Generation uses
+    greedy decoding so differences come from the backend, not from sampling.
+
+    Args:
+        backends (list): Backend names from rag.com.backends.BACKENDS
+        max_new_tokens (int): Tokens generated per prompt
+        output_path (Path): Where to write the JSON report
+    """
+    from rag.com.config import config, LOGS_DIR
+    from rag.com.backends import load_causal_lm, load_sentiment_pipeline
+    from rag.com.utils_ref import ModelManager, PROMPTS
+
+    model_path = ModelManager()._generator_path()
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    prompts = [PROMPTS['qa'].format(query=query) for query in SAMPLE_QUERIES]
+    sentiment_model = "distilbert-base-uncased-finetuned-sst-2-english"
+
+    report = {"max_new_tokens": max_new_tokens, "reference": backends[0], "backends": {}}
+    reference_tokens = None
+    reference_sentiment = None
+
+    for backend in backends:
+        logger.info(f"Benchmarking backend: {backend}")
+        start = time.perf_counter()
+        model = load_causal_lm(model_path, backend, Path(config['onnx_generator_dir']))
+        load_seconds = time.perf_counter() - start
+
+        # Warm up once so one-time graph initialization is not counted as throughput
+        _greedy_generate(model, tokenizer, prompts[:1], 2)
+        tokens, seconds = _greedy_generate(model, tokenizer, prompts, max_new_tokens)
+        generated = sum(len(sequence) for sequence in tokens)
+
+        analyzer = load_sentiment_pipeline(sentiment_model, backend, Path(config['onnx_sentiment_dir']))
+        analyzer(SAMPLE_SNIPPETS[:1])
+        start = time.perf_counter()
+        sentiment = analyzer(SAMPLE_SNIPPETS, batch_size=len(SAMPLE_SNIPPETS))
+        sentiment_seconds = time.perf_counter() - start
+
+        if reference_tokens is None:
+            reference_tokens, reference_sentiment = tokens, sentiment
+
+        report["backends"][backend] = {
+            "generator_load_seconds": round(load_seconds, 3),
+            "generation_seconds": round(seconds, 3),
+            "tokens_per_second": round(generated / seconds, 2) if seconds else None,
+            "token_agreement": round(
+                sum(_token_agreement(a, b) for a, b in zip(reference_tokens, tokens)) / len(tokens), 4
+            ),
+            "exact_match_prompts": sum(a == b for a, b in zip(reference_tokens, tokens)),
+            "sentiment_snippets_per_second": round(len(SAMPLE_SNIPPETS) / sentiment_seconds, 2),
+            "sentiment_label_agreement": sum(
+                a["label"] == b["label"] for a, b in zip(reference_sentiment, sentiment)
+            ) / len(sentiment),
+            "sentiment_max_score_diff": round(max(
+                abs(a["score"] - b["score"]) for a, b in zip(reference_sentiment, sentiment)
+            ), 6)
+        }
+        del model, analyzer
+
+    output_path = Path(output_path or LOGS_DIR / 'backend_report.json')
+    output_path.write_text(json.dumps(report, indent=2))
+
+    logger.info(f"{'backend':<8} {'tok/s':>8} {'agree':>7} {'exact':>6} {'snip/s':>8} {'labels':>7}")
+    for backend, result in report["backends"].items():
+        logger.info(
+            f"{backend:<8} {result['tokens_per_second']:>8} {result['token_agreement']:>7} "
+            f"{result['exact_match_prompts']:>6} {result['sentiment_snippets_per_second']:>8} "
+            f"{result['sentiment_label_agreement']:>7}"
+        )
+    logger.info(f"Report written to {output_path}")
+    return report
+
+
+if __name__ == "__main__":
+    backends = os.getenv('BACKENDS', 'eager,int8,onnx').split(',')
+    max_new_tokens = int(os.getenv('MAX_NEW_TOKENS', '32'))
+    compare_backends(backends, max_new_tokens)
@@ -44,11 +44,40 @@ def download_model(model_name='gpt2', model_dir='models/gpt2'):
         logger.error(f"Error downloading model: {str(e)}")
         return False
 
+def convert_to_onnx(model_dir='models/gpt2', onnx_dir='models/onnx',
+                    sentiment_model='distilbert-base-uncased-finetuned-sst-2-english'):
+    """
+    Export GPT-2 and the sentiment model to ONNX for INFERENCE_BACKEND=onnx.
+    
+    Args:
+        model_dir (str): Directory of the downloaded GPT-2 model
+        onnx_dir (str): Directory to write the exported models to
+        sentiment_model (str): HuggingFace name of the sentiment model
+    """
+    try:
+        from rag.com.backends import export_onnx
+        
+        onnx_path = Path(onnx_dir)
+        logger.info(f"Exporting {model_dir} to ONNX...")
+        export_onnx(model_dir, onnx_path / 'gpt2', task='causal-lm')
+        
+        logger.info(f"Exporting {sentiment_model} to ONNX...")
+        export_onnx(sentiment_model, onnx_path / 'sentiment', task='sequence-classification')
+        
+        logger.info(f"ONNX export completed in {onnx_dir}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Error exporting ONNX models: {str(e)}")
+        return False
+
 if __name__ == "__main__":
     # Get model directory from environment variable or use default
     model_dir = os.getenv('MODEL_PATH', 'models/gpt2')
     model_name = os.getenv('MODEL_NAME', 'gpt2')
     
     success = download_model(model_name, model_dir)
+    if success and os.getenv('EXPORT_ONNX', 'false').lower() == 'true':
+        success = convert_to_onnx(model_dir, os.getenv('ONNX_MODELS_DIR', 'models/onnx'))
     if not success:
         exit(1) 
\ No newline at end of file
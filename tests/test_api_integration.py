@@ -2,6 +2,7 @@ import requests
 import pytest
 import time
 import os
+import json
 
 # Base URL for the API - configurable via environment variables
 API_HOST = os.getenv('API_HOST', 'localhost')
@@ -134,4 +135,120 @@ def test_document_operations():
     assert "content" in content, "No content in response"
     assert "filename" in content, "No filename in response"
     assert content["filename"] == "test.txt"
-    assert "test document content" in content["content"] 
\ No newline at end of file
+    assert "test document content" in content["content"]
+
+
+def test_generate_streaming():
+    """Test the NDJSON streaming mode of the generate endpoint"""
+    test_query = {
+        "query": "How do I create a user?",
+        "stream": True
+    }
+    
+    response = requests.post(
+        f"{API_URL}/api/v1/generate",
+        json=test_query,
+        stream=True
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("application/x-ndjson")
+    
+    events = [json.loads(line) for line in response.iter_lines() if line]
+    assert events, "No events streamed"
+    assert events[-1].get("done") is True
+    assert all("token" in event for event in events[:-1])
+
+def test_warmup_and_readiness():
+    """Test that warmup loads the models and readiness reports them"""
+    warmup_response = requests.post(f"{API_URL}/api/v1/warmup", json={})
+    assert warmup_response.status_code == 200
+    assert all(model["loaded"] for model in warmup_response.json()["models"].values())
+    
+    ready_response = requests.get(f"{API_URL}/api/v1/ready")
+    assert ready_response.status_code == 200
+    
+    data = ready_response.json()
+    assert data["ready"] is True
+    assert "imports" in data["startup"]
+
+def test_upload_ingestion_job():
+    """Test that an upload is indexed by a background job"""
+    files = {'file': ('ingest.txt', b'The ingestion job indexes this document in the background.', 'text/plain')}
+    upload_response = requests.post(f"{API_URL}/api/v1/documents", files=files)
+    assert upload_response.status_code == 201, f"Upload failed: {upload_response.text}"
+    
+    data = upload_response.json()
+    assert "job_id" in data, "No job_id in response"
+    
+    job = None
+    for _ in range(60):
+        job_response = requests.get(f"{API_URL}/api/v1/jobs/{data['job_id']}")
+        assert job_response.status_code == 200
+        job = job_response.json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(1)
+    
+    assert job["status"] == "done", f"Ingestion job did not finish: {job}"
+    assert job["file_id"] == data["file_id"]
+    assert job["result"]["chunks_indexed"] > 0
+
+def test_document_listing_pagination():
+    """Test cursor pagination of the document listing"""
+    for i in range(3):
+        files = {'file': (f'page{i}.txt', b'Pagination test document', 'text/plain')}
+        assert requests.post(f"{API_URL}/api/v1/documents", files=files).status_code == 201
+    
+    first = requests.get(f"{API_URL}/api/v1/documents", params={"limit": 2}).json()
+    assert len(first["files"]) == 2
+    assert first["next_cursor"] == first["files"][-1]["file_id"]
+    
+    second = requests.get(
+        f"{API_URL}/api/v1/documents", params={"limit": 2, "cursor": first["next_cursor"]}
+    ).json()
+    first_ids = {f["file_id"] for f in first["files"]}
+    assert not first_ids & {f["file_id"] for f in second["files"]}
+    
+    response = requests.get(f"{API_URL}/api/v1/documents", params={"format": "ndjson"})
+    assert response.headers["Content-Type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert first_ids <= {line["file_id"] for line in lines}
+
+def test_document_raw_download():
+    """Test streamed raw download with Range and ETag support"""
+    content = b'0123456789' * 100
+    files = {'file': ('raw.txt', content, 'text/plain')}
+    file_id = requests.post(f"{API_URL}/api/v1/documents", files=files).json()["file_id"]
+    url = f"{API_URL}/api/v1/documents/{file_id}/raw"
+    
+    response = requests.get(url)
+    assert response.status_code == 200
+    assert response.content == content
+    etag = response.headers["ETag"]
+    
+    partial = requests.get(url, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == content[10:20]
+    assert partial.headers["Content-Range"] == f"bytes 10-19/{len(content)}"
+    
+    assert requests.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert requests.get(url, headers={"Range": f"bytes={len(content)}-"}).status_code == 416
+
+def test_batch_search():
+    """Test that batch search returns every occurrence of each query"""
+    files = {'file': ('batch.txt', b'Rotate the key. Then rotate the KEY again.', 'text/plain')}
+    job_id = requests.post(f"{API_URL}/api/v1/documents", files=files).json()["job_id"]
+    for _ in range(60):
+        if requests.get(f"{API_URL}/api/v1/jobs/{job_id}").json()["status"] in ("done", "failed"):
+            break
+        time.sleep(1)
+    
+    response = requests.post(f"{API_URL}/api/v1/search/batch", json={
+        "queries": ["rotate the key", "again"],
+        "filename": "batch.txt"
+    })
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["total"] == 2
+    assert [o["start"] for o in results[0]["occurrences"]] == [0, 21]
+    assert results[1]["total"] == 1